@@ -1,6 +1,6 @@
 python3.8 -m venv venv
 source ./venv/bin/activate
 pip install deepspeech-tflite==0.9.3 --no-deps --no-chace-dir
-pip install flask==3.0.3 flask_socketio==5.3.6 gevent==24.2.1 tactigon_gear==5.1.1 PyAudio==0.2.13 webrtcvad==2.0.10 pynput==1.7.7 sympy==1.13.2 --no-chace-dir
+pip install flask==3.0.3 flask_socketio==5.3.6 gevent==24.2.1 tactigon_gear==5.1.1 PyAudio==0.2.13 webrtcvad==2.0.10 pynput==1.7.7 --no-chace-dir
 pip install tactigon_speech==5.0.6 --no-deps --no-chace-dir
 pause
@@ -83,9 +83,14 @@ class Server(Process):
 
             shapes_app.braccio_interface = braccio_interface
             shapes_app.zion_interface = zion_interface
+            shapes_app.event_driven = app_config.SHAPES_EVENT_DRIVEN
+            shapes_app.heartbeat = app_config.SHAPES_HEARTBEAT
+            shapes_app.log_capacity = app_config.SHAPES_LOG_CAPACITY
+            shapes_app.log_coalesce_window = app_config.SHAPES_LOG_COALESCE
 
             socket_app.shapes_app = shapes_app
             socket_app.braccio_interface = braccio_interface
+            socket_app.log_batch = app_config.SOCKET_LOG_BATCH
 
             flask_app.extensions[TSKIN_EXTENSION] = None
             tskin = None
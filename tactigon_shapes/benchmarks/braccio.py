@@ -0,0 +1,226 @@
+"""
+Benchmark the Braccio command pipeline on the simulated arm (see SimulatedArm).
+
+Write path: the same commands are written by Braccio.write_command for several MTUs, with or without
+write-without-response support, and by the former write path (20 bytes chunks, default write type) for comparison.
+The simulated link times the writes like a BLE connection: a write with response takes a connection interval for
+the request and one for the response, writes without response share the connection events.
+
+Pipeline: a Braccio thread drives the simulated arm while a tilt-like stream of moves is queued at a fixed rate,
+once on a clean link and once with the latency, loss and disconnects given on the command line.
+Every request must get a result: the exit code is 1 when some of them hang.
+
+Usage:
+    python -m tactigon_shapes.benchmarks.braccio [--commands 500] [--rate 50] [--duration 5] [--loss 0.02] [--disconnect 0.01] [--output result.json]
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import platform
+import random
+import sys
+import time
+from collections import Counter
+from datetime import datetime
+from typing import List, Tuple
+
+from ..modules.braccio.extension import Braccio
+from ..modules.braccio.models import BraccioConfig, BraccioCommand, BraccioPosition, SimulatorConfig, Wrist, Gripper
+from ..modules.braccio.simulator import SimulatedArm, SimulatedClient
+
+async def legacy_write(client: SimulatedClient, command_bytes: bytes):
+    """
+    The write path before the MTU was used: 20 bytes chunks, written with the default write type
+    """
+    while command_bytes:
+        payload = command_bytes[:20]
+        command_bytes = command_bytes[20:]
+        await client.write_gatt_char(Braccio.CMD, payload)
+
+def sample_commands(count: int, seed: int = 0) -> List[bytes]:
+    """
+    Encoded commands, mostly moves with a home every 50 commands
+    """
+    rng = random.Random(seed)
+    commands = []
+
+    for i in range(count):
+        if i % 50 == 49:
+            command = BraccioCommand.Home()
+        else:
+            command = BraccioCommand.Move(
+                BraccioPosition(
+                    rng.randint(0, 180),
+                    rng.randint(15, 165),
+                    rng.randint(0, 180),
+                    rng.randint(0, 180),
+                    rng.choice(list(Wrist)),
+                    rng.choice(list(Gripper)),
+                )
+            )
+        commands.append(Braccio.get_cmd_bytes(command))
+
+    return commands
+
+def percentile(durations: List[float], p: float) -> float:
+    if not durations:
+        return 0
+
+    ordered = sorted(durations)
+    return ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+
+async def run_write_path(commands: List[bytes], mtu_size: int, without_response: bool, interval: float, legacy: bool) -> dict:
+    arm = SimulatedArm(SimulatorConfig(latency=0, interval=interval, mtu=mtu_size, write_without_response=without_response))
+    link = arm.client("benchmark")
+    await link.connect()
+
+    braccio = Braccio(BraccioConfig("benchmark", "benchmark"), client_factory=arm.client)  # type: ignore
+    braccio.client = link  # type: ignore
+    await braccio.configure_writes()
+
+    latencies = []
+    start = time.perf_counter()
+    for command_bytes in commands:
+        command_start = time.perf_counter()
+        if legacy:
+            await legacy_write(link, command_bytes)
+        else:
+            await braccio.write_command(command_bytes)
+        latencies.append(time.perf_counter() - command_start)
+    elapsed = time.perf_counter() - start
+
+    return dict(
+        path="legacy" if legacy else "mtu",
+        mtu=mtu_size,
+        write_without_response=without_response,
+        chunk_size=20 if legacy else braccio._write_size,
+        commands=len(commands),
+        bytes=arm.written,
+        writes=arm.writes,
+        bytes_per_second=arm.written / elapsed,
+        latency_p50=percentile(latencies, 0.5),
+        latency_p95=percentile(latencies, 0.95),
+        latency_max=max(latencies),
+    )
+
+WRITE_PATHS: List[Tuple[int, bool, bool]] = [
+    (23, False, True),
+    (23, True, True),
+    (23, False, False),
+    (23, True, False),
+    (247, False, False),
+    (247, True, False),
+]
+
+def tilt_path(i: int, rate: float) -> Tuple[float, float, float]:
+    t = i / rate
+    return 150 * math.sin(t), 200 + 50 * math.sin(t / 3), 100 + 80 * math.cos(t)
+
+def run_pipeline(config: SimulatorConfig, rate: float, duration: float, timeout: float) -> dict:
+    """
+    Queue a stream of moves on a Braccio driving the simulated arm
+
+    :param config: simulated arm and link
+    :param rate: moves per second
+    :param duration: seconds of moves
+    :param timeout: timeout of each move
+    :return: pipeline result
+    """
+    arm = SimulatedArm(config)
+    braccio = Braccio(BraccioConfig("benchmark", "simulator", simulator=config), client_factory=arm.client)  # type: ignore
+    braccio.start()
+
+    deadline = time.perf_counter() + 5
+    while not braccio.connected and time.perf_counter() < deadline:
+        time.sleep(0.01)
+
+    requests = []
+    queued = 0
+    start = time.perf_counter()
+    last_command = None
+
+    for i in range(int(rate * duration)):
+        command = braccio.move_command(*tilt_path(i, rate), clamp=True)
+        if command:
+            last_command = command
+            queued += 1
+            requested = time.perf_counter()
+            waiter = braccio.add_command(command, timeout, coalesce=True)
+            waiter.future.add_done_callback(lambda f, r=requested: requests.append((r, time.perf_counter(), f.result())))
+
+        time.sleep(max(0, start + (i + 1) / rate - time.perf_counter()))
+
+    deadline = time.perf_counter() + timeout + 1
+    while len(requests) < queued and time.perf_counter() < deadline:
+        time.sleep(0.01)
+
+    finished = time.perf_counter()
+    braccio.stop()
+
+    latencies = [done - requested for requested, done, _ in requests]
+    statuses = Counter(result[1].name for _, _, result in requests)
+    final = last_command.position if last_command else None
+
+    return dict(
+        latency=config.latency,
+        loss=config.loss,
+        disconnect=config.disconnect,
+        speed=config.speed,
+        requested=queued,
+        answered=len(requests),
+        hung=queued - len(requests),
+        sent_to_arm=arm.commands,
+        statuses=dict(statuses),
+        latency_p50=percentile(latencies, 0.5),
+        latency_p95=percentile(latencies, 0.95),
+        latency_max=max(latencies, default=0),
+        drain_seconds=finished - start - duration,
+        final_position_reached=final is not None and arm.position == (final.base, final.shoulder, final.elbow, final.wrist, final.wrist_rotation.value, final.gripper.value),
+        arm=arm.stats(),
+    )
+
+def main():
+    parser = argparse.ArgumentParser("Braccio command pipeline benchmark")
+    parser.add_argument("-n", "--commands", help="Commands written in each write path scenario", type=int, default=500)
+    parser.add_argument("-i", "--interval", help="Simulated connection interval in seconds", type=float, default=0.015)
+    parser.add_argument("-r", "--rate", help="Moves per second queued in the pipeline scenarios", type=float, default=50)
+    parser.add_argument("-d", "--duration", help="Seconds of moves in the pipeline scenarios", type=float, default=5)
+    parser.add_argument("-t", "--timeout", help="Timeout of each move", type=float, default=2)
+    parser.add_argument("--latency", help="One way latency of the faulty link", type=float, default=0.05)
+    parser.add_argument("--loss", help="Probability of losing a command or a notification on the faulty link", type=float, default=0.02)
+    parser.add_argument("--disconnect", help="Probability of a disconnect after each command on the faulty link", type=float, default=0.01)
+    parser.add_argument("--speed", help="Servo speed in degrees per second", type=float, default=120)
+    parser.add_argument("--seed", help="Seed of the simulated faults", type=int, default=0)
+    parser.add_argument("-o", "--output", help="Write the JSON result to this file", type=str, default=None)
+    args = parser.parse_args()
+
+    commands = sample_commands(args.commands)
+    write_paths = [asyncio.run(run_write_path(commands, mtu_size, without_response, args.interval, legacy)) for mtu_size, without_response, legacy in WRITE_PATHS]
+
+    pipelines = [
+        run_pipeline(SimulatorConfig(speed=args.speed, interval=args.interval, seed=args.seed), args.rate, args.duration, args.timeout),
+        run_pipeline(SimulatorConfig(speed=args.speed, latency=args.latency, jitter=args.latency / 2, loss=args.loss, disconnect=args.disconnect, interval=args.interval, seed=args.seed), args.rate, args.duration, args.timeout),
+    ]
+
+    report = dict(
+        created=datetime.now().isoformat(),
+        python=platform.python_version(),
+        platform=platform.platform(),
+        interval=args.interval,
+        packets_per_event=SimulatedArm.PACKETS_PER_EVENT,
+        write_paths=write_paths,
+        pipelines=pipelines,
+    )
+
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump(report, output_file, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+    sys.exit(1 if any(p["hung"] for p in pipelines) else 0)
+
+if __name__ == "__main__":
+    main()
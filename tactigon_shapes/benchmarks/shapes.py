@@ -0,0 +1,327 @@
+"""
+Benchmark every stored shape against replayed TSkin input.
+
+Each program is loaded by ShapeThread, exactly as when it runs from the app, and its ticks are driven
+back to back with local fakes in place of Braccio, Zion and the keyboard.
+The input is a recording of the shape (see TSkinRecorder) or a synthetic stream of angles, gestures and touches.
+
+Programs generated before the current app() signature are skipped: open and save them in the editor to benchmark them.
+A shape logging errors while it runs is reported as failed, without timings, and the exit code is 1.
+
+Usage:
+    python -m tactigon_shapes.benchmarks.shapes [--ticks 2000] [--shape <id>] [--recording <file>] [--output result.json]
+"""
+
+import argparse
+import inspect
+import json
+import math
+import platform
+import sys
+import time
+import tracemalloc
+from concurrent.futures import Future
+from datetime import datetime
+from os import path, listdir
+from queue import Empty
+from typing import Any, List, Optional, Tuple
+from uuid import UUID
+
+from ..modules.braccio.models import CommandStatus
+from ..modules.shapes.extension import ShapeConfig, ShapeThread, LoggingQueue, Severity
+from ..modules.tskin.models import OneFingerGesture, TwoFingerGesture
+from ..modules.tskin.replay import ReplayTSkin, RecordedEvent, ANGLE, GYRO, ACCELERATION, GESTURE, TOUCH
+
+GESTURES = ("up", "down", "push", "pull", "twist", "circle", "swipe_r", "swipe_l")
+APP_ARGUMENTS = ("tskin", "keyboard", "braccio", "zion", "actions", "logging_queue")
+
+def done(result: Any) -> Future:
+    future = Future()
+    future.set_result(result)
+    return future
+
+class FakeBraccio:
+    """
+    Braccio that accepts every command right away
+    """
+    RESULT: Tuple[bool, CommandStatus, float] = (True, CommandStatus.OK, 0.0)
+
+    connected: bool = True
+    running: bool = True
+
+    def move(self, *args, **kwargs):
+        return self.RESULT
+
+    def wrist(self, *args, **kwargs):
+        return self.RESULT
+
+    def gripper(self, *args, **kwargs):
+        return self.RESULT
+
+    def home(self):
+        return self.RESULT
+
+    def on(self):
+        return self.RESULT
+
+    def off(self):
+        return self.RESULT
+
+    def move_async(self, *args, **kwargs) -> Future:
+        return done(self.RESULT)
+
+    def wrist_async(self, *args, **kwargs) -> Future:
+        return done(self.RESULT)
+
+    def gripper_async(self, *args, **kwargs) -> Future:
+        return done(self.RESULT)
+
+    def home_async(self) -> Future:
+        return done(self.RESULT)
+
+    def on_async(self) -> Future:
+        return done(self.RESULT)
+
+    def off_async(self) -> Future:
+        return done(self.RESULT)
+
+class FakeZion:
+    """
+    Zion that answers every request with an empty result, without network
+    """
+    configured: bool = True
+
+    def device_last_telemetry(self, *args, **kwargs) -> Optional[dict]:
+        return {}
+
+    def device_attr(self, *args, **kwargs) -> Optional[dict]:
+        return {}
+
+    def device_alarm(self, *args, **kwargs) -> Optional[List[dict]]:
+        return []
+
+    def send_device_last_telemetry(self, *args, **kwargs) -> bool:
+        return True
+
+    def send_device_attr(self, *args, **kwargs) -> bool:
+        return True
+
+    def upsert_device_alarm(self, *args, **kwargs) -> bool:
+        return True
+
+    def send_device_last_telemetry_async(self, *args, **kwargs) -> Future:
+        return done(True)
+
+    def send_device_attr_async(self, *args, **kwargs) -> Future:
+        return done(True)
+
+    def upsert_device_alarm_async(self, *args, **kwargs) -> Future:
+        return done(True)
+
+class FakeKeyboard:
+    """
+    Keyboard that counts key presses instead of sending them to the OS
+    """
+    pressed_keys: int = 0
+
+    def press(self, key):
+        self.pressed_keys += 1
+
+    def release(self, key):
+        pass
+
+def synthetic_input(duration: float, tick: float) -> List[RecordedEvent]:
+    """
+    Build a deterministic TSkin stream: angles, gyro and acceleration on every tick,
+    a gesture every second and a tap every 1.5 seconds
+
+    :param duration: stream length in seconds
+    :param tick: sampling period of the continuous sensors
+    :return: recorded events
+    """
+    events: List[RecordedEvent] = []
+    samples = int(duration / tick)
+
+    for i in range(samples):
+        t = round(i * tick, 4)
+        phase = 2 * math.pi * t / 4
+        events.append((t, ANGLE, [round(90 * math.sin(phase), 2), round(45 * math.cos(phase), 2), round(180 * math.sin(phase / 2), 2)]))
+        events.append((t, GYRO, [round(math.cos(phase), 3), round(-math.sin(phase), 3), 0]))
+        events.append((t, ACCELERATION, [0, round(math.sin(phase), 3), 1]))
+
+        if i and i % int(1 / tick) == 0:
+            events.append((t, GESTURE, [GESTURES[(i // int(1 / tick)) % len(GESTURES)], 1, 1]))
+
+        if i and i % int(1.5 / tick) == 0:
+            events.append((t, TOUCH, [OneFingerGesture.SINGLE_TAP.value, TwoFingerGesture.NONE.value, 0.5, 0.5]))
+
+    return events
+
+def load_input(base_path: str, config: ShapeConfig, recording: Optional[str], ticks: int) -> Tuple[List[RecordedEvent], str]:
+    if recording:
+        return ReplayTSkin.FromFile(recording, None).events, path.basename(recording)
+
+    recordings_path = path.join(base_path, "programs", config.id.hex, "recordings")
+    if path.exists(recordings_path):
+        recordings = sorted(f for f in listdir(recordings_path) if f.endswith(".rec.gz"))
+        if recordings:
+            return ReplayTSkin.FromFile(path.join(recordings_path, recordings[-1]), None).events, recordings[-1]
+
+    return synthetic_input(ticks * ShapeThread.TICK, ShapeThread.TICK), "synthetic"
+
+def drain(logging_queue: LoggingQueue) -> Tuple[int, Optional[str]]:
+    """
+    Empty the log queue
+
+    :return: number of errors and the last error message
+    """
+    errors = 0
+    last_error = None
+    while True:
+        try:
+            msg = logging_queue.get_nowait()
+        except Empty:
+            return errors, last_error
+
+        if msg.severity == Severity.ERROR:
+            errors += msg.repeat
+            last_error = msg.message
+
+def stale_program(thread: ShapeThread) -> Optional[str]:
+    """
+    Check that the program app() accepts the arguments ShapeThread.main passes to it
+
+    :return: the reason why the program cannot run, None if it can
+    """
+    try:
+        inspect.signature(thread.module.app).bind(*APP_ARGUMENTS)
+    except TypeError as e:
+        return f"Program generated for another app() signature, save it again in the editor ({e})"
+    except AttributeError:
+        return "Program without app()"
+
+    return None
+
+def percentile(durations: List[float], p: float) -> float:
+    ordered = sorted(durations)
+    return ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+
+def benchmark_shape(base_path: str, config: ShapeConfig, ticks: int, recording: Optional[str] = None) -> dict:
+    """
+    Run a shape for a number of ticks on a deterministic replay clock
+
+    :param base_path: shapes config folder
+    :param config: shape to run
+    :param ticks: ticks to run in each pass
+    :param recording: TSkin recording to replay, defaults to the newest recording of the shape or synthetic input
+    :return: benchmark result
+    """
+    events, source = load_input(base_path, config, recording, ticks)
+    tskin = ReplayTSkin(events, None)
+    logging_queue = LoggingQueue()
+    thread = ShapeThread(base_path, config, FakeKeyboard(), FakeBraccio(), FakeZion(), logging_queue, tskin)  # type: ignore
+
+    stale = stale_program(thread)
+    if stale:
+        return dict(id=config.id.hex, name=config.name, skipped=stale)
+
+    durations: List[float] = []
+    errors = 0
+    last_error = None
+    start = time.perf_counter()
+    for _ in range(ticks):
+        tskin.advance(ShapeThread.TICK)
+        tick_start = time.perf_counter()
+        thread.main()
+        durations.append(time.perf_counter() - tick_start)
+        tick_errors, tick_error = drain(logging_queue)
+        errors += tick_errors
+        last_error = tick_error or last_error
+    elapsed = time.perf_counter() - start
+
+    # the timings of a failing program measure its exception path
+    if errors:
+        return dict(id=config.id.hex, name=config.name, input=source, ticks=ticks, errors=errors, error=last_error)
+
+    tskin.rewind()
+    allocated = 0
+    retained = 0
+    tracemalloc.start()
+    try:
+        for _ in range(ticks):
+            tskin.advance(ShapeThread.TICK)
+            tracemalloc.clear_traces()
+            thread.main()
+            current, peak = tracemalloc.get_traced_memory()
+            allocated += peak
+            retained += current
+            drain(logging_queue)
+    finally:
+        tracemalloc.stop()
+
+    return dict(
+        id=config.id.hex,
+        name=config.name,
+        input=source,
+        ticks=ticks,
+        errors=0,
+        ticks_per_second=ticks / elapsed if elapsed else None,
+        p50=percentile(durations, 0.5),
+        p99=percentile(durations, 0.99),
+        max=max(durations),
+        alloc_bytes_per_tick=allocated / ticks,
+        retained_bytes_per_tick=retained / ticks,
+        calls=thread.profile["calls"],
+    )
+
+def main():
+    parser = argparse.ArgumentParser("Tactigon Shapes benchmark")
+    parser.add_argument("-C", "--config", help="Shapes config folder", type=str, default=path.join("config", "shapes"))
+    parser.add_argument("-n", "--ticks", help="Ticks per shape", type=int, default=2000)
+    parser.add_argument("-s", "--shape", help="Only run this shape id", type=str, action="append")
+    parser.add_argument("-r", "--recording", help="TSkin recording to replay for every shape", type=str, default=None)
+    parser.add_argument("-o", "--output", help="Write the JSON result to this file", type=str, default=None)
+    args = parser.parse_args()
+
+    with open(path.join(args.config, "config.json")) as config_file:
+        configs = [ShapeConfig.FromJSON(c) for c in json.load(config_file)]
+
+    if args.shape:
+        configs = [c for c in configs if c.id in [UUID(s) for s in args.shape]]
+
+    results = []
+    for config in configs:
+        if not path.exists(path.join(args.config, "programs", config.id.hex, config.app_file)):
+            continue
+
+        try:
+            results.append(benchmark_shape(args.config, config, args.ticks, args.recording))
+        except Exception as e:
+            results.append(dict(id=config.id.hex, name=config.name, error=str(e)))
+
+        result = results[-1]
+        if "skipped" in result:
+            print(f"{config.name}: skipped, {result['skipped']}", file=sys.stderr)
+        elif "error" in result:
+            print(f"{config.name}: failed, {result.get('errors', 1)} errors, {result['error']}", file=sys.stderr)
+        else:
+            print(f"{config.name}: {result['ticks_per_second']:.0f} ticks/s", file=sys.stderr)
+
+    report = dict(
+        created=datetime.now().isoformat(),
+        python=platform.python_version(),
+        platform=platform.platform(),
+        tick=ShapeThread.TICK,
+        shapes=results,
+    )
+
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump(report, output_file, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+    sys.exit(1 if any("error" in r for r in results) else 0)
+
+if __name__ == "__main__":
+    main()
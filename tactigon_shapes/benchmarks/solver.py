@@ -0,0 +1,208 @@
+"""
+Benchmark the Braccio inverse kinematics and check it against the former sympy implementation.
+
+Every point of a dense grid over the Braccio workspace is solved by Solver and by the sympy reference:
+both must reject the same points and return the same angles (rounding of values close to .5 may differ by 1 degree).
+The reference needs sympy, which is no longer a dependency of the app; without it only the timings are reported.
+The batch solver (move_to_positions_cart) is checked against Solver point by point and must match exactly.
+The Workspace lookup table must reject the same points as Solver, its interpolated angles may differ by 1 degree.
+
+Usage:
+    python -m tactigon_shapes.benchmarks.solver [--step 20] [--reference-points 2000] [--output result.json]
+"""
+
+import argparse
+import json
+import sys
+import time
+from math import degrees
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from ..modules.braccio.middleware import Solver, Workspace
+
+Point = Tuple[float, float, float]
+
+class SympySolver(Solver):
+    """
+    The sympy implementation Solver had before the closed form one, kept as reference
+    """
+    def move_to_position_cart(self, x, y, z):
+        import sympy
+
+        r_compensation = 1.02
+        z = z + 15
+        r_hor = sympy.sqrt(x ** 2 + y ** 2)
+        r = sympy.sqrt(r_hor ** 2 + (z - 71.5) ** 2) * r_compensation  # type: ignore
+
+        if y < 0:
+            raise Exception()
+
+        if y == 0:
+            if x <= 0:
+                theta_base = 180
+            else:
+                theta_base = 0
+        else:
+            theta_base = 90 - degrees(sympy.atan(x / y))
+
+        alpha1 = sympy.acos(((r - self.l2) / (self.l1 + self.l3)))
+        theta_shoulder = degrees(alpha1)
+        alpha3 = sympy.sin((sympy.sin(alpha1) * self.l3 - sympy.sin(alpha1) * self.l1) / self.l2)  # type: ignore
+        theta_elbow = (90 - degrees(alpha1)) + degrees(alpha3)
+        theta_wrist = (90 - degrees(alpha1)) - degrees(alpha3)
+
+        if theta_wrist <= 0:
+            alpha1 = sympy.acos(((r - self.l2) / (self.l1 + self.l3)))
+            theta_shoulder = degrees(alpha1 + sympy.sin((self.l3 - self.l1) / r))  # type: ignore
+            theta_elbow = (90 - degrees(alpha1))
+            theta_wrist = (90 - degrees(alpha1))
+
+        if z != self.l0:
+            theta_shoulder = theta_shoulder + degrees(sympy.atan(((z - self.l0) / r)))
+
+        theta_elbow = theta_elbow + 5
+        theta_wrist = theta_wrist + 5
+
+        return round(theta_base), round(theta_shoulder), round(theta_elbow), round(theta_wrist), x, y, z
+
+def grid(step: int) -> Iterator[Point]:
+    """
+    Points of the workspace box, reachable or not
+
+    :param step: grid spacing in mm
+    """
+    for x in range(-400, 401, step):
+        for y in range(-step, 401, step):
+            for z in range(-100, 451, step):
+                yield x, y, z
+
+def solve(solver: Solver, point: Point) -> Optional[Tuple[int, int, int, int]]:
+    try:
+        return solver.move_to_position_cart(*point)[:4]
+    except Exception:
+        return None
+
+def timing(solver: Solver, points: List[Point]) -> float:
+    start = time.perf_counter()
+    for point in points:
+        solve(solver, point)
+    return (time.perf_counter() - start) / len(points)
+
+def batch_timing(solver: Solver, points: List[Point]) -> Tuple[float, List[Point]]:
+    """
+    Solve the points with the batch solver and compare them with the scalar one
+
+    :param solver: solver to test
+    :param points: points to solve
+    :return: seconds per point and the points where the two solvers disagree
+    """
+    x, y, z = (np.array(axis, dtype=float) for axis in zip(*points))
+
+    start = time.perf_counter()
+    base, shoulder, elbow, wrist, reachable = solver.move_to_positions_cart(x, y, z)
+    elapsed = time.perf_counter() - start
+
+    mismatch = []
+    for i, point in enumerate(points):
+        expected = solve(solver, point)
+        got = (int(base[i]), int(shoulder[i]), int(elbow[i]), int(wrist[i])) if reachable[i] else None
+        if got != (tuple(expected) if expected else None):
+            mismatch.append(point)
+
+    return elapsed / len(points), mismatch
+
+def workspace_check(workspace: Workspace, points: List[Point], results: List[Optional[Tuple[int, int, int, int]]]) -> dict:
+    """
+    Compare the Workspace lookups with the Solver results and time them
+
+    :param workspace: workspace to test
+    :param points: points to solve
+    :param results: Solver results of the points
+    :return: report entries
+    """
+    start = time.perf_counter()
+    lookups = [workspace.solve(*point) for point in points]
+    elapsed = time.perf_counter() - start
+
+    reachability = [p for p, r, e in zip(points, lookups, results) if (r is None) != (e is None)]
+    differences = [max(abs(a - b) for a, b in zip(r, e)) for r, e in zip(lookups, results) if r and e]
+
+    unreachable = [p for p, r in zip(points, results) if r is None]
+    start = time.perf_counter()
+    clamped = [workspace.nearest(*point) for point in unreachable]
+    clamp_seconds = (time.perf_counter() - start) / max(1, len(unreachable))
+
+    return dict(
+        workspace_seconds_per_call=elapsed / len(points),
+        workspace_reachability_mismatches=len(reachability),
+        workspace_max_angle_difference=max(differences, default=0),
+        workspace_angle_differences=sum(1 for d in differences if d),
+        workspace_nearest_seconds_per_call=clamp_seconds,
+        workspace_nearest_unreachable=sum(1 for point in clamped if workspace.solve(*point) is None),
+    )
+
+def main():
+    parser = argparse.ArgumentParser("Braccio solver benchmark")
+    parser.add_argument("-s", "--step", help="Grid spacing in mm", type=int, default=20)
+    parser.add_argument("-n", "--reference-points", help="Points timed with the sympy reference", type=int, default=2000)
+    parser.add_argument("-o", "--output", help="Write the JSON result to this file", type=str, default=None)
+    args = parser.parse_args()
+
+    points = list(grid(args.step))
+    solver = Solver()
+    results = [solve(solver, point) for point in points]
+
+    report = dict(
+        points=len(points),
+        reachable=sum(1 for r in results if r is not None),
+        solver_seconds_per_call=timing(solver, points),
+    )
+
+    batch_seconds, batch_mismatch = batch_timing(solver, points)
+    report.update(
+        batch_seconds_per_point=batch_seconds,
+        batch_mismatches=len(batch_mismatch),
+        batch_mismatch_samples=[list(p) for p in batch_mismatch[:10]],
+    )
+
+    try:
+        import sympy
+    except ImportError:
+        sympy = None
+        print("sympy not installed, skipping the equivalence check", file=sys.stderr)
+
+    report.update(workspace_check(Workspace(solver), points, results))
+
+    exit_code = 1 if batch_mismatch or report["workspace_reachability_mismatches"] or report["workspace_max_angle_difference"] > 1 or report["workspace_nearest_unreachable"] else 0
+    if sympy:
+        reference = SympySolver()
+        reference_results = [solve(reference, point) for point in points]
+
+        reachability = [p for p, r, e in zip(points, results, reference_results) if (r is None) != (e is None)]
+        rounding = [p for p, r, e in zip(points, results, reference_results) if r and e and r != e and max(abs(a - b) for a, b in zip(r, e)) <= 1]
+        mismatch = [p for p, r, e in zip(points, results, reference_results) if r and e and max(abs(a - b) for a, b in zip(r, e)) > 1]
+
+        report.update(
+            reference_seconds_per_call=timing(reference, points[::max(1, len(points) // args.reference_points)]),
+            reachability_mismatches=len(reachability),
+            rounding_differences=len(rounding),
+            angle_mismatches=len(mismatch),
+            mismatch_samples=[list(p) for p in (reachability + mismatch)[:10]],
+        )
+        report["speedup"] = report["reference_seconds_per_call"] / report["solver_seconds_per_call"]
+
+        if reachability or mismatch:
+            exit_code = 1
+
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump(report, output_file, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+    sys.exit(exit_code)
+
+if __name__ == "__main__":
+    main()
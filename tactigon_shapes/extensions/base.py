@@ -8,25 +8,70 @@ from flask import Flask
 
 class ExtensionThread(ABC, Thread):
     TICK: float = 0.02
+    fixed_rate: bool = True
     _stop_event: Event
+    _ticks: int
+    _missed_deadlines: int
+    _last_tick_duration: float
 
     def __init__(self):
         Thread.__init__(self, daemon=False)
         self._stop_event = Event()
+        self._ticks = 0
+        self._missed_deadlines = 0
+        self._last_tick_duration = 0
 
     def run(self):
+        next_tick = time.perf_counter()
+
         while not self._stop_event.is_set():
+            tick_start = time.perf_counter()
+
+            if not self.fixed_rate:
+                next_tick = tick_start
+
             self.main()
-            time.sleep(self.TICK)
+
+            tick_end = time.perf_counter()
+            self._ticks += 1
+            self._last_tick_duration = tick_end - tick_start
+
+            next_tick += self.TICK
+            if tick_end > next_tick:
+                # Deadline missed: restart the schedule from now instead of bursting to catch up
+                self._missed_deadlines += 1
+                next_tick = tick_end
+
+            self.wait(next_tick - tick_end)
 
     @abstractmethod
     def main(self):
         pass
 
+    def wait(self, timeout: float):
+        """
+        Pause between two ticks. Subclasses can override it to wake up on their own signals
+
+        :param timeout: maximum time to wait, in seconds
+        """
+        self._stop_event.wait(timeout)
+
     @property
     def is_running(self) -> bool:
         return not self._stop_event.is_set() and self.is_alive()
 
+    @property
+    def ticks(self) -> int:
+        return self._ticks
+
+    @property
+    def missed_deadlines(self) -> int:
+        return self._missed_deadlines
+
+    @property
+    def last_tick_duration(self) -> float:
+        return self._last_tick_duration
+
     def start(self):
         self._stop_event.clear()
         Thread.start(self)
@@ -1,5 +1,5 @@
 from functools import wraps
-from flask import Blueprint, render_template, flash, redirect, url_for, current_app
+from flask import Blueprint, Response, render_template, flash, redirect, url_for, current_app
 
 from . import __version__
 
@@ -7,7 +7,10 @@ from .config import check_config
 from .modules.socketio import get_socket_app
 from .utils.extensions import stop_apps
 
-from .modules.tskin.manager import stop_tskin
+from .modules.tskin.manager import stop_tskin, get_tskin
+from .modules.shapes.manager import get_shapes_app
+from .modules.braccio.manager import get_braccio_interface
+from .utils.metrics import REGISTRY, gauge_samples
 
 bp = Blueprint('main', __name__, template_folder="main")
 
@@ -28,6 +31,24 @@ def index():
 def settings():
     return render_template("info.jinja", version=__version__)
 
+@bp.route("/metrics")
+def metrics():
+    lines = []
+
+    tskin = get_tskin()
+    lines += gauge_samples("tactigon_tskin_connected", "TSkin connection state", (), [((), 1 if tskin and tskin.connected else 0)])
+    if tskin and tskin.battery is not None:
+        lines += gauge_samples("tactigon_tskin_battery_volts", "TSkin battery voltage", (), [((), tskin.battery)])
+
+    braccio = get_braccio_interface()
+    lines += gauge_samples("tactigon_braccio_connected", "Braccio connection state", (), [((), 1 if braccio and braccio.connected else 0)])
+
+    shapes = get_shapes_app()
+    if shapes:
+        lines += shapes.metrics()
+
+    return Response(REGISTRY.render(lines), mimetype="text/plain; version=0.0.4")
+
 @bp.route("/quit")
 def quit():
     stop_apps()
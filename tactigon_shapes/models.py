@@ -28,6 +28,11 @@ class AppConfig(object):
     TSKIN: Optional[TSkinConfig] = None
     TSKIN_VOICE: Optional[VoiceConfig] = None
     file_path: Optional[str] = None
+    SHAPES_EVENT_DRIVEN: bool = False
+    SHAPES_HEARTBEAT: float = 0.5
+    SOCKET_LOG_BATCH: int = 100
+    SHAPES_LOG_CAPACITY: int = 1000
+    SHAPES_LOG_COALESCE: float = 1
 
     @classmethod
     def Default(cls, file_path):
@@ -69,7 +74,12 @@ class AppConfig(object):
             [TSkinModel.FromJSON(f) for f in json["MODELS"]],
             TSkinConfig.FromJSON(json["TSKIN"]) if "TSKIN" in json and json["TSKIN"] is not None else None,
             VoiceConfig.FromJSON(json["TSKIN_VOICE"]) if "TSKIN_VOICE" in json and json["TSKIN_VOICE"] is not None and sys.platform != "darwin" else None,
-            file_path
+            file_path,
+            SHAPES_EVENT_DRIVEN=json["SHAPES_EVENT_DRIVEN"] if "SHAPES_EVENT_DRIVEN" in json else False,
+            SHAPES_HEARTBEAT=json["SHAPES_HEARTBEAT"] if "SHAPES_HEARTBEAT" in json else 0.5,
+            SOCKET_LOG_BATCH=json["SOCKET_LOG_BATCH"] if "SOCKET_LOG_BATCH" in json else 100,
+            SHAPES_LOG_CAPACITY=json["SHAPES_LOG_CAPACITY"] if "SHAPES_LOG_CAPACITY" in json else 1000,
+            SHAPES_LOG_COALESCE=json["SHAPES_LOG_COALESCE"] if "SHAPES_LOG_COALESCE" in json else 1,
             )
     
     def toJSON(self) -> object:
@@ -79,7 +89,12 @@ class AppConfig(object):
             "SEND_FILE_MAX_AGE_DEFAULT": self.SEND_FILE_MAX_AGE_DEFAULT,
             "MODELS": [m.toJSON() for m in self.MODELS],
             "TSKIN": self.TSKIN.toJSON() if self.TSKIN else None,
-            "TSKIN_VOICE": self.TSKIN_VOICE.toJSON() if self.TSKIN_VOICE else None
+            "TSKIN_VOICE": self.TSKIN_VOICE.toJSON() if self.TSKIN_VOICE else None,
+            "SHAPES_EVENT_DRIVEN": self.SHAPES_EVENT_DRIVEN,
+            "SHAPES_HEARTBEAT": self.SHAPES_HEARTBEAT,
+            "SOCKET_LOG_BATCH": self.SOCKET_LOG_BATCH,
+            "SHAPES_LOG_CAPACITY": self.SHAPES_LOG_CAPACITY,
+            "SHAPES_LOG_COALESCE": self.SHAPES_LOG_COALESCE,
         }
     
     def save(self):
@@ -4,25 +4,137 @@ import json
 import os
 from flask import Flask
 from bleak import BleakClient
-from threading import Thread, Event
-from queue import Queue
-from dataclasses import dataclass
+from threading import Thread, Event, Lock
+from queue import Empty
+from collections import deque
+from concurrent.futures import Future, InvalidStateError, TimeoutError as FutureTimeoutError
+from dataclasses import dataclass, field
+
+from typing import Callable, Deque, List, Optional, Tuple
+
+from .middleware import Solver, Workspace
+from ...utils.metrics import BRACCIO_COMMAND_SECONDS, BRACCIO_COMMAND_TIMEOUTS, BRACCIO_COMMANDS_COALESCED
+from .models import BraccioConfig, BraccioCommand, BraccioPosition, Command, CommandStatus, Wrist, Gripper
+from .simulator import SimulatedArm
+
+CommandResult = Tuple[bool, CommandStatus, float]
+
+@dataclass
+class CommandWaiter:
+    """
+    A caller waiting for a command. The future gets the success, the status of the arm and the execution time.
+    """
+    command: Command
+    deadline: float
+    created: float = field(default_factory=time.perf_counter)
+    future: Future = field(default_factory=Future)
+
+@dataclass
+class PendingCommand:
+    """
+    A command waiting in the queue or executing on the arm, with the callers waiting for it.
+    Only coalesce commands can be merged with each other (see CommandQueue).
+    """
+    command: BraccioCommand
+    waiters: List[CommandWaiter] = field(default_factory=list)
+    sent: float = 0
+    coalesce: bool = False
 
-from typing import Optional, Tuple
-
-from .middleware import Solver
-from .models import BraccioConfig, BraccioCommand, BraccioPosition, CommandStatus, Wrist, Gripper
+    @property
+    def waiting(self) -> bool:
+        return any(not waiter.future.done() for waiter in self.waiters)
+
+class CommandQueue:
+    """
+    Commands waiting to be sent to the Braccio, in order.
+    Streamed targets (a tilt following the hand...) are queued with coalesce, so the arm does not lag behind its callers:
+        - a coalesce Move not sent yet is replaced by the next coalesce Move, whose result also goes to the callers of the replaced one
+        - a coalesce command equal to the last coalesce one queued (or executing, when the queue is empty) is not queued again,
+          its callers share the result of the previous one
+    Every other command (helpers of the shapes, Home, On, Off...) is a barrier: it is never merged and nothing is merged across it.
+    """
+    _items: Deque[PendingCommand]
+    _lock: Lock
+
+    def __init__(self):
+        self._items = deque()
+        self._lock = Lock()
+
+    def put(self, command: BraccioCommand, waiter: CommandWaiter, executing: Optional[PendingCommand] = None, coalesce: bool = False) -> PendingCommand:
+        """
+        Queue a command
+
+        :param command: command to send
+        :param waiter: caller of the command
+        :param executing: command executing on the arm
+        :param coalesce: the command is a streamed target, it can be merged with the other coalesce commands
+        :return: the queued command that will answer the caller
+        """
+        with self._lock:
+            if coalesce:
+                last = self._items[-1] if self._items else executing
+
+                if last and last.coalesce and last.command == command and last.waiting:
+                    last.waiters.append(waiter)
+                    BRACCIO_COMMANDS_COALESCED.inc(command.command.name, "duplicate")
+                    return last
+
+                tail = self._items[-1] if self._items else None
+
+                if tail and tail.coalesce and tail.command.command is Command.MOVE and command.command is Command.MOVE:
+                    tail.command = command
+                    tail.waiters.append(waiter)
+                    BRACCIO_COMMANDS_COALESCED.inc(command.command.name, "superseded")
+                    return tail
+
+            pending = PendingCommand(command, [waiter], coalesce=coalesce)
+            self._items.append(pending)
+            return pending
+
+    def requeue(self, pending: PendingCommand):
+        """
+        Put back a command that could not be sent, ahead of the others
+        """
+        with self._lock:
+            pending.sent = 0
+            self._items.appendleft(pending)
+
+    def get_nowait(self) -> PendingCommand:
+        with self._lock:
+            if not self._items:
+                raise Empty()
+
+            return self._items.popleft()
+
+    def items(self) -> List[PendingCommand]:
+        with self._lock:
+            return list(self._items)
+
+    def qsize(self) -> int:
+        return len(self._items)
+
+    def empty(self) -> bool:
+        return not self._items
 
 class Braccio(Thread):
     _TICK: float = 0.1
     CMD: str = "6E400002-B5A3-F393-E0A9-E50E24DCCA9E"
     STATUS: str = "6E400003-B5A3-F393-E0A9-E50E24DCCA9E"
+    CHUNK_SIZE: int = 20
+    ATT_HEADER: int = 3
+    STATUS_TIMEOUT: float = 10
 
     config: BraccioConfig
 
     solver: Solver
+    workspace: Workspace
+    command_queue: CommandQueue
+    client_factory: Callable[[str], BleakClient]
     _stop_event: Event
-    _cmd_status: Optional[CommandStatus] 
+    _pending: Optional[PendingCommand]
+    _wakeup: Optional[asyncio.Event]
+    _write_size: int
+    _write_response: bool
     client: Optional[BleakClient]
     _running: bool = False
     x_coord: float = 0
@@ -35,14 +147,19 @@ class Braccio(Thread):
     wrist_position: Wrist = Wrist.HORIZONTAL
     gripper_position: Gripper = Gripper.CLOSE
 
-    def __init__(self, config: BraccioConfig):
+    def __init__(self, config: BraccioConfig, cache_path: Optional[str] = None, client_factory: Optional[Callable[[str], BleakClient]] = None):
         Thread.__init__(self, daemon=True)
 
         self.config = config
-        self.command_queue = Queue()
+        self.command_queue = CommandQueue()
+        self.client_factory = client_factory or BleakClient
         self.solver = Solver()
+        self.workspace = Workspace(self.solver, cache_path=cache_path)
         self._stop_event = Event()
-        self._cmd_status = None
+        self._pending = None
+        self._wakeup = None
+        self._write_size = self.CHUNK_SIZE
+        self._write_response = True
         self.client = None
 
     def __enter__(self):
@@ -80,14 +197,62 @@ class Braccio(Thread):
 
     def update(self, char, data: bytearray):
         recv = data.decode()
-        self._cmd_status = CommandStatus(recv)
+        status = CommandStatus(recv)
+        pending = self._pending
+
+        if pending is None or status is CommandStatus.EXECUTING:
+            return
+
+        self._pending = None
+        execution_time = time.perf_counter() - pending.sent
+        for waiter in pending.waiters:
+            self.resolve(waiter, status, execution_time)
+
+        if self._wakeup:
+            self._wakeup.set()
+
+    def resolve(self, waiter: CommandWaiter, status: CommandStatus, execution_time: float) -> bool:
+        """
+        Give its result to a caller, unless it already has one
+
+        :return: True if the caller got this result
+        """
+        try:
+            waiter.future.set_result((status is CommandStatus.OK, status, execution_time))
+        except InvalidStateError:
+            return False
+
+        if status is CommandStatus.TIMEOUT:
+            BRACCIO_COMMAND_TIMEOUTS.inc(waiter.command.name)
+        else:
+            BRACCIO_COMMAND_SECONDS.observe(waiter.command.name, status.name, value=time.perf_counter() - waiter.created)
+
+        return True
+
+    def expire(self):
+        """
+        Time out the callers whose deadline passed, queued or executing
+        """
+        now = time.perf_counter()
+        pending = self.command_queue.items()
+
+        if self._pending:
+            pending.append(self._pending)
+
+        for command in pending:
+            for waiter in command.waiters:
+                if waiter.deadline <= now:
+                    self.resolve(waiter, CommandStatus.TIMEOUT, now - waiter.created)
 
     async def main(self):
+        self._wakeup = asyncio.Event()
+
         while not self._stop_event.is_set():
-            self.client = BleakClient(self.config.address)
+            self.client = self.client_factory(self.config.address)
             try:
                 await self.client.connect()
                 await self.client.start_notify(Braccio.STATUS, self.update)
+                await self.configure_writes()
             except Exception as e:
                 pass
 
@@ -96,49 +261,140 @@ class Braccio(Thread):
                     await self.client.disconnect()
                     return
 
-                command = self.get_command()
-                if command:
-                    self._cmd_status = CommandStatus.EXECUTING
-                    command_bytes = self.get_cmd_bytes(command)
-                    while command_bytes:
-                        payload = command_bytes[:20]
-                        command_bytes = command_bytes[20:]
-                        await self.client.write_gatt_char(
-                            self.CMD,
-                            payload
-                        )
-
-                await asyncio.sleep(self._TICK)
-
+                self.expire()
+
+                # the status never came: the arm is not executing the command any more
+                if self._pending and time.perf_counter() - self._pending.sent > self.STATUS_TIMEOUT:
+                    self._pending = None
+
+                # one command at a time on the arm, until it answers even when its callers gave up,
+                # so a late status cannot answer the next command. The next ones keep being coalesced in the queue
+                if self._pending is None:
+                    pending = self.get_command()
+
+                    if pending and not pending.waiting:
+                        # its callers gave up before it was sent
+                        continue
+
+                    if pending:
+                        self._pending = pending
+                        pending.sent = time.perf_counter()
+                        try:
+                            await self.write_command(self.get_cmd_bytes(pending.command))
+                        except Exception as e:
+                            self._pending = None
+                            if self.client.is_connected:
+                                for waiter in pending.waiters:
+                                    self.resolve(waiter, CommandStatus.ERROR_1, 0)
+                            else:
+                                # connection lost while writing: send it again once reconnected
+                                self.command_queue.requeue(pending)
+                        continue
+
+                await self.wait_command()
+
+            # the status of the command on the arm is lost with the connection: commands are absolute
+            # positions or states, so it is sent again once reconnected
+            if self._pending:
+                self.command_queue.requeue(self._pending)
+                self._pending = None
+
+            self.expire()
             await asyncio.sleep(self._TICK)
 
         if self.client:
             await self.client.disconnect()
 
-    def add_command(self, command: BraccioCommand):
-        self.command_queue.put(command)
+    async def configure_writes(self):
+        """
+        Choose how commands are written on this connection: without response, in chunks as large as the
+        characteristic allows, when it supports it; otherwise with response, in chunks as large as the MTU allows
+        """
+        self._write_size = self.CHUNK_SIZE
+        self._write_response = True
+
+        characteristic = self.client.services.get_characteristic(self.CMD) if self.client else None
+        if characteristic is None:
+            return
+
+        if "write-without-response" in characteristic.properties:
+            self._write_response = False
+            self._write_size = max(self.CHUNK_SIZE, characteristic.max_write_without_response_size)
+            return
+
+        self._write_size = max(self.CHUNK_SIZE, self.client.mtu_size - self.ATT_HEADER)
+
+    async def write_command(self, command_bytes: bytes):
+        """
+        Write an encoded command to the arm, chunks back to back
+
+        :param command_bytes: command, see get_cmd_bytes
+        """
+        if not self.client:
+            return
+
+        for offset in range(0, len(command_bytes), self._write_size):
+            await self.client.write_gatt_char(
+                self.CMD,
+                command_bytes[offset:offset + self._write_size],
+                response=self._write_response
+            )
+
+    async def wait_command(self):
+        """
+        Sleep until a command is added or completed, at most a tick to check the connection and the stop event
+        """
+        if not self._wakeup:
+            return
+
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), self._TICK)
+        except asyncio.TimeoutError:
+            pass
+
+        self._wakeup.clear()
+
+    def add_command(self, command: BraccioCommand, timeout: float = 10, coalesce: bool = False) -> CommandWaiter:
+        """
+        Queue a command without waiting for it
+
+        :param command: command to send
+        :param timeout: seconds to wait for the status of the arm
+        :param coalesce: the command is a streamed target, see CommandQueue
+        :return: the caller entry, whose future gets the result
+        """
+        waiter = CommandWaiter(command.command, time.perf_counter() + timeout)
+        self.command_queue.put(command, waiter, self._pending, coalesce)
 
-    def get_command(self) -> Optional[BraccioCommand]:
+        if self._wakeup:
+            try:
+                self.loop.call_soon_threadsafe(self._wakeup.set)
+            except RuntimeError:
+                pass
+
+        return waiter
+
+    def get_command(self) -> Optional[PendingCommand]:
         try:
             return self.command_queue.get_nowait()
         except Exception as e:
             return None
         
-    def send_command(self, command: BraccioCommand, timeout: float = 10) -> Tuple[bool, CommandStatus, float]:
-        self.add_command(command)
-        t = 0
-
-        while t < timeout:
-            cmd_status = self._cmd_status
-            if cmd_status and cmd_status is not CommandStatus.EXECUTING:
-                self._cmd_status = None
-                return (cmd_status is CommandStatus.OK, cmd_status, t)
-                
-            t += self._TICK
-            time.sleep(self._TICK) 
-        
-        self._cmd_status = None
-        return (False, CommandStatus.TIMEOUT, t)
+    def send_command(self, command: BraccioCommand, timeout: float = 10) -> CommandResult:
+        """
+        Queue a command and wait for the arm to execute it
+
+        :param command: command to send
+        :param timeout: seconds to wait for the status of the arm
+        :return: success, status of the arm and execution time (from the command being sent to its status)
+        """
+        waiter = self.add_command(command, timeout)
+
+        try:
+            return waiter.future.result(timeout)
+        except FutureTimeoutError:
+            self.resolve(waiter, CommandStatus.TIMEOUT, time.perf_counter() - waiter.created)
+            return waiter.future.result()
 
     def x(self, value: float):
         return self.move(value, self._y, self._z)
@@ -149,64 +405,69 @@ class Braccio(Thread):
     def z(self, value: float):
         return self.move(self._x, self._y, value)
 
-    def wrist(self, wrist: Wrist):
+    def position_command(self) -> BraccioCommand:
+        return BraccioCommand.Move(
+            BraccioPosition(
+                self.base_angle, 
+                self.shoulder_angle, 
+                self.elbow_angle, 
+                self.wrist_angle, 
+                self.wrist_position, 
+                self.gripper_position)
+            )
+
+    def wrist_command(self, wrist: Wrist) -> BraccioCommand:
         self.wrist_position = wrist
+        return self.position_command()
 
-        return self.send_command(
-            BraccioCommand.Move(
-                BraccioPosition(
-                    self.base_angle, 
-                    self.shoulder_angle, 
-                    self.elbow_angle, 
-                    self.wrist_angle, 
-                    self.wrist_position, 
-                    self.gripper_position)
-                )
-        )
-    
-    def gripper(self, gripper: Gripper):
+    def gripper_command(self, gripper: Gripper) -> BraccioCommand:
         self.gripper_position = gripper
+        return self.position_command()
+
+    def move_command(self, x: float, y: float, z: float, wrist: Wrist = Wrist.HORIZONTAL, gripper: Gripper = Gripper.CLOSE, clamp: bool = False) -> Optional[BraccioCommand]:
+        """
+        Solve a target and update the position of the arm.
+        The workspace table rejects or clamps the targets out of reach, the Solver computes the angles.
+
+        :return: the Move command, None when the target is out of reach
+        """
+        if not self.workspace.is_reachable(x, y, z):
+            if not clamp:
+                return None
+
+            x, y, z = self.workspace.nearest(x, y, z)
 
-        return self.send_command(
-            BraccioCommand.Move(
-                BraccioPosition(
-                    self.base_angle, 
-                    self.shoulder_angle, 
-                    self.elbow_angle, 
-                    self.wrist_angle, 
-                    self.wrist_position, 
-                    self.gripper_position)
-                )
-        )
-
-    def move(self, x: float, y: float, z: float, wrist: Wrist = Wrist.HORIZONTAL, gripper: Gripper = Gripper.CLOSE, timeout: float = 10) -> Tuple[bool, CommandStatus, float]:
         try:
-            self.base_angle, self.shoulder_angle, self.elbow_angle, self.wrist_angle, self._x, self._y, self._z = self.solver.move_to_position_cart(x, y, z)
-            self.wrist_position = wrist
-            self.gripper_position = gripper
-        except Exception as e:
+            self.base_angle, self.shoulder_angle, self.elbow_angle, self.wrist_angle = self.solver.move_to_position_cart(x, y, z)[:4]
+        except Exception:
+            return None
+
+        self._x, self._y, self._z = x, y, z
+        self.wrist_position = wrist
+        self.gripper_position = gripper
+        return self.position_command()
+
+    def wrist(self, wrist: Wrist):
+        return self.send_command(self.wrist_command(wrist))
+    
+    def gripper(self, gripper: Gripper):
+        return self.send_command(self.gripper_command(gripper))
+
+    def move(self, x: float, y: float, z: float, wrist: Wrist = Wrist.HORIZONTAL, gripper: Gripper = Gripper.CLOSE, timeout: float = 10, clamp: bool = False) -> CommandResult:
+        command = self.move_command(x, y, z, wrist, gripper, clamp)
+
+        if command is None:
             return (False, CommandStatus.OUT_OF_RANGE, 0)
         
-        return self.send_command(
-            BraccioCommand.Move(
-                BraccioPosition(
-                    self.base_angle, 
-                    self.shoulder_angle, 
-                    self.elbow_angle, 
-                    self.wrist_angle, 
-                    self.wrist_position, 
-                    self.gripper_position)
-                )
-            , timeout
-        )
+        return self.send_command(command, timeout)
         
-    def home(self) -> Tuple[bool, CommandStatus, float]:
+    def home(self) -> CommandResult:
         return self.send_command(BraccioCommand.Home())
 
-    def on(self) -> Tuple[bool, CommandStatus, float]:
+    def on(self) -> CommandResult:
         return self.send_command(BraccioCommand.On())
 
-    def off(self) -> Tuple[bool, CommandStatus, float]:
+    def off(self) -> CommandResult:
         return self.send_command(BraccioCommand.Off())
 
 class BraccioInterface:
@@ -236,6 +497,10 @@ class BraccioInterface:
     def connected(self) -> bool:
         return bool(self._thread.connected) if self._thread else False
     
+    @property
+    def clamp(self) -> bool:
+        return self.config.clamp if self.config else False
+
     @property
     def config_file(self) -> str:
         return os.path.join(self.config_file_path, "config.json")
@@ -269,7 +534,8 @@ class BraccioInterface:
             self.stop()
 
         if self.config:
-            self._thread = Braccio(self.config)
+            client_factory = SimulatedArm(self.config.simulator).client if self.config.simulator else None
+            self._thread = Braccio(self.config, self.config_file_path, client_factory)  # type: ignore
             self._thread.start()
             self.move(0, 100, 100)
             
@@ -287,7 +553,7 @@ class BraccioInterface:
 
     def move(self, x: float, y: float, z: float, timeout: float = 10):
         if self._thread:
-            return self._thread.move(x, y, z, self._thread.wrist_position, self._thread.gripper_position, timeout)
+            return self._thread.move(x, y, z, self._thread.wrist_position, self._thread.gripper_position, timeout, self.clamp)
         
         return None
         
@@ -309,6 +575,42 @@ class BraccioInterface:
         
         return None
 
+    def queue(self, command: Optional[BraccioCommand], timeout: float = 10, coalesce: bool = False) -> Future:
+        """
+        Queue a command on the Braccio without waiting for it. Commands are sent in order,
+        only the coalesce ones are merged (see CommandQueue)
+
+        :param command: command to send, None when the target is out of reach
+        :param timeout: seconds to wait for the status of the arm
+        :param coalesce: the command is a streamed target
+        :return: Future of the result, None when the Braccio is not running
+        """
+        if self._thread and command:
+            return self._thread.add_command(command, timeout, coalesce).future
+
+        future = Future()
+        future.set_result((False, CommandStatus.OUT_OF_RANGE, 0) if self._thread else None)
+        return future
+
+    def move_async(self, x: float, y: float, z: float, timeout: float = 10, coalesce: bool = False) -> Future:
+        command = self._thread.move_command(x, y, z, self._thread.wrist_position, self._thread.gripper_position, self.clamp) if self._thread else None
+        return self.queue(command, timeout, coalesce)
+
+    def wrist_async(self, wrist: Wrist) -> Future:
+        return self.queue(self._thread.wrist_command(wrist) if self._thread else None)
+
+    def gripper_async(self, gripper: Gripper) -> Future:
+        return self.queue(self._thread.gripper_command(gripper) if self._thread else None)
+
+    def home_async(self) -> Future:
+        return self.queue(BraccioCommand.Home())
+
+    def on_async(self) -> Future:
+        return self.queue(BraccioCommand.On())
+
+    def off_async(self) -> Future:
+        return self.queue(BraccioCommand.Off())
+
     def stop(self):
         if self._thread:
             self._thread.stop()
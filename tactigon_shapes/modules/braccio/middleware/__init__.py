@@ -1,3 +1,4 @@
-__all__ = ["Solver"]
+__all__ = ["Solver", "Workspace"]
 
-from ..middleware.solver import Solver
\ No newline at end of file
+from ..middleware.solver import Solver
+from ..middleware.workspace import Workspace
\ No newline at end of file
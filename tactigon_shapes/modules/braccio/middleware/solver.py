@@ -1,6 +1,6 @@
-from math import degrees
+from math import degrees, sqrt, acos, atan, sin
 
-import sympy
+import numpy as np
 
 
 class Solver:
@@ -12,8 +12,8 @@ class Solver:
     def move_to_position_cart(self, x, y, z):
         r_compensation = 1.02  # add 2 percent
         z = z + 15  # compensation for backlash
-        r_hor = sympy.sqrt(x ** 2 + y ** 2)
-        r = sympy.sqrt(r_hor ** 2 + (z - 71.5) ** 2) * r_compensation  # type: ignore
+        r_hor = sqrt(x ** 2 + y ** 2)
+        r = sqrt(r_hor ** 2 + (z - 71.5) ** 2) * r_compensation
 
         if y < 0:
             raise Exception()
@@ -24,29 +24,29 @@ class Solver:
             else:
                 theta_base = 0
         else:
-            theta_base = 90 - degrees(sympy.atan(x / y))  # add 2 degrees for backlash compensation
+            theta_base = 90 - degrees(atan(x / y))  # add 2 degrees for backlash compensation
         # print(theta_base)
         # theta_base=backlash_compensation_base(theta_base)  #check if compensation is needed
 
         # calulcate angles for level operation
 
-        alpha1 = sympy.acos(((r - self.l2) / (self.l1 + self.l3)))
+        alpha1 = acos(((r - self.l2) / (self.l1 + self.l3)))  # ValueError when out of reach
         theta_shoulder = degrees(alpha1)
         # compensate for the difference in arm length
-        alpha3 = sympy.sin((sympy.sin(alpha1) * self.l3 - sympy.sin(alpha1) * self.l1) / self.l2)  # type: ignore
+        alpha3 = sin((sin(alpha1) * self.l3 - sin(alpha1) * self.l1) / self.l2)
         theta_elbow = (90 - degrees(alpha1)) + degrees(alpha3)
         theta_wrist = (90 - degrees(alpha1)) - degrees(alpha3)
 
         if theta_wrist <= 0:  # when arm length compensation results in negative values
-            alpha1 = sympy.acos(((r - self.l2) / (self.l1 + self.l3)))
-            theta_shoulder = degrees(alpha1 + sympy.sin((self.l3 - self.l1) / r))  # type: ignore
+            alpha1 = acos(((r - self.l2) / (self.l1 + self.l3)))
+            theta_shoulder = degrees(alpha1 + sin((self.l3 - self.l1) / r))
             theta_elbow = (90 - degrees(alpha1))
             theta_wrist = (90 - degrees(alpha1))
 
         # adjust shoulder angle to increase heigth
         if z != self.l0:
-            theta_shoulder = theta_shoulder + degrees(sympy.atan(((z - self.l0) / r)))
-            # print(degrees(sympy.atan(((z-self.l0)/r))))
+            theta_shoulder = theta_shoulder + degrees(atan(((z - self.l0) / r)))
+            # print(degrees(atan(((z-self.l0)/r))))
 
         # add compensation for bad line-up of servo with mount
         theta_elbow = theta_elbow + 5
@@ -54,9 +54,77 @@ class Solver:
 
         return round(theta_base), round(theta_shoulder), round(theta_elbow), round(theta_wrist), x, y, z
 
+    def arm_angles(self, r_hor, z):
+        """
+        Vectorized shoulder, elbow and wrist angles of move_to_position_cart, not rounded.
+        They only depend on the horizontal distance of the target from the base axis and on its height.
+
+        :param r_hor: array of horizontal distances
+        :param z: array of z coordinates
+        :return: shoulder, elbow and wrist angle arrays, the reachability mask and the mask of the points solved with the negative wrist fallback
+        """
+        r_hor, z = np.broadcast_arrays(np.asarray(r_hor, dtype=float), np.asarray(z, dtype=float))
+
+        r_compensation = 1.02
+        z = z + 15
+        r = np.sqrt(r_hor ** 2 + (z - 71.5) ** 2) * r_compensation
+
+        level = (r - self.l2) / (self.l1 + self.l3)
+        reachable = np.abs(level) <= 1
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            alpha1 = np.arccos(np.clip(level, -1, 1))
+            theta_shoulder = np.degrees(alpha1)
+            alpha3 = np.sin((np.sin(alpha1) * self.l3 - np.sin(alpha1) * self.l1) / self.l2)
+            theta_elbow = (90 - np.degrees(alpha1)) + np.degrees(alpha3)
+            theta_wrist = (90 - np.degrees(alpha1)) - np.degrees(alpha3)
+
+            fallback = theta_wrist <= 0
+            theta_shoulder = np.where(fallback, np.degrees(alpha1 + np.sin((self.l3 - self.l1) / r)), theta_shoulder)
+            theta_elbow = np.where(fallback, 90 - np.degrees(alpha1), theta_elbow)
+            theta_wrist = np.where(fallback, 90 - np.degrees(alpha1), theta_wrist)
+
+            theta_shoulder = np.where(z != self.l0, theta_shoulder + np.degrees(np.arctan((z - self.l0) / r)), theta_shoulder)
+
+        return theta_shoulder, theta_elbow + 5, theta_wrist + 5, reachable, fallback
+
+    def base_angles(self, x, y):
+        """
+        Vectorized base angle of move_to_position_cart, not rounded
+
+        :param x: array of x coordinates
+        :param y: array of y coordinates
+        :return: base angle array
+        """
+        x, y = np.broadcast_arrays(np.asarray(x, dtype=float), np.asarray(y, dtype=float))
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(
+                y == 0,
+                np.where(x <= 0, 180.0, 0.0),
+                90 - np.degrees(np.arctan(x / np.where(y == 0, 1, y)))
+            )
+
+    def move_to_positions_cart(self, x, y, z):
+        """
+        Vectorized move_to_position_cart: same compensations and fallback, for many points at once
+
+        :param x: array of x coordinates
+        :param y: array of y coordinates
+        :param z: array of z coordinates
+        :return: base, shoulder, elbow and wrist angle arrays (0 where unreachable) and the reachability mask
+        """
+        x, y, z = np.broadcast_arrays(np.asarray(x, dtype=float), np.asarray(y, dtype=float), np.asarray(z, dtype=float))
+
+        theta_shoulder, theta_elbow, theta_wrist, reachable, _ = self.arm_angles(np.sqrt(x ** 2 + y ** 2), z)
+        reachable = reachable & (y >= 0)
+
+        angles = [np.where(reachable, np.round(theta), 0).astype(int) for theta in (self.base_angles(x, y), theta_shoulder, theta_elbow, theta_wrist)]
+        return angles[0], angles[1], angles[2], angles[3], reachable
+
 
 if __name__ == "__main__":
     s = Solver()
     cart = s.move_to_position_cart(100, 100, 0)
 
-    print(cart)
\ No newline at end of file
+    print(cart)
@@ -0,0 +1,318 @@
+import os
+from math import atan, ceil, degrees, sqrt
+from typing import Optional, Tuple
+
+import numpy as np
+
+from .solver import Solver
+
+Angles = Tuple[int, int, int, int]
+Point = Tuple[float, float, float]
+
+class Workspace:
+    """
+    Precomputed solutions of the Solver, to answer the moves of the arm without solving them from scratch.
+
+    Shoulder, elbow and wrist only depend on the horizontal distance of the target from the base axis and on its height,
+    so the table is a grid over that half plane, STEP mm apart; the base angle is computed for each target.
+    Each cell of the grid is:
+        - EMPTY when none of its corners is reachable: the targets in it are rejected without solving
+        - INNER when all its corners are reachable, solved on the same branch (see the negative wrist fallback
+          of the Solver) and the interpolation at its centre is within TOLERANCE degrees of the Solver:
+          the angles are interpolated from the corners
+        - BORDER otherwise: the targets in it are solved exactly
+
+    The table is cached in a .npz file, rebuilt when the Solver dimensions or the step change.
+    """
+    STEP: float = 5
+    TOLERANCE: float = 0.25
+    FILE_NAME: str = "workspace.npz"
+    REFINE_STEPS: int = 10
+
+    EMPTY: int = 0
+    INNER: int = 1
+    BORDER: int = 2
+
+    solver: Solver
+    step: float
+    z_min: float
+    angles: np.ndarray
+    cells: np.ndarray
+    edge: np.ndarray
+
+    def __init__(self, solver: Solver, step: Optional[float] = None, cache_path: Optional[str] = None):
+        self.solver = solver
+        self.step = step or self.STEP
+
+        if not (cache_path and self.load(cache_path)):
+            self.build()
+
+            if cache_path:
+                self.save(cache_path)
+
+        self._coefficients = self.coefficients()
+
+    @property
+    def key(self) -> np.ndarray:
+        return np.array([self.solver.l0, self.solver.l1, self.solver.l2, self.solver.l3, self.step, self.TOLERANCE])
+
+    def build(self):
+        """
+        Solve the grid, classify its cells and collect the reachable points on the border of the workspace
+        """
+        # farthest reachable target from the shoulder, see Solver.arm_angles
+        reach = (self.solver.l1 + self.solver.l2 + self.solver.l3) / 1.02
+        shoulder_z = self.solver.l0 - 15
+
+        r_count = int(ceil(reach / self.step)) + 2
+        z_count = int(ceil(2 * reach / self.step)) + 3
+        self.z_min = shoulder_z - (z_count - 1) * self.step / 2
+
+        r_hor, z = np.meshgrid(np.arange(r_count) * self.step, self.z_min + np.arange(z_count) * self.step, indexing="ij")
+        shoulder, elbow, wrist, reachable, fallback = self.solver.arm_angles(r_hor, z)
+
+        self.angles = np.stack([shoulder, elbow, wrist], axis=-1)
+
+        corners_reachable = reachable[:-1, :-1].astype(int) + reachable[1:, :-1] + reachable[:-1, 1:] + reachable[1:, 1:]
+        corners_fallback = fallback[:-1, :-1].astype(int) + fallback[1:, :-1] + fallback[:-1, 1:] + fallback[1:, 1:]
+
+        self.cells = np.full(corners_reachable.shape, self.BORDER, dtype=np.int8)
+        self.cells[corners_reachable == 0] = self.EMPTY
+        self.cells[(corners_reachable == 4) & ((corners_fallback == 0) | (corners_fallback == 4))] = self.INNER
+
+        # close to the shoulder the angles change too fast to be interpolated
+        centre = self.solver.arm_angles(r_hor[:-1, :-1] + self.step / 2, z[:-1, :-1] + self.step / 2)
+        interpolated = (self.angles[:-1, :-1] + self.angles[1:, :-1] + self.angles[:-1, 1:] + self.angles[1:, 1:]) / 4
+        with np.errstate(invalid="ignore"):
+            error = np.abs(np.stack(centre[:3], axis=-1) - interpolated).max(axis=-1)
+        self.cells[(self.cells == self.INNER) & ~(error <= self.TOLERANCE)] = self.BORDER
+
+        self.edge = self.find_edge(r_hor, z, reachable)
+
+    def find_edge(self, r_hor: np.ndarray, z: np.ndarray, reachable: np.ndarray) -> np.ndarray:
+        """
+        Points on the border of the workspace, found by bisection between each reachable point of the grid
+        and its unreachable neighbours. The points are on the reachable side, less than step / 2 ** REFINE_STEPS away.
+
+        :return: array of (r_hor, z) points
+        """
+        padded = np.pad(reachable, 1, constant_values=True)
+        inside = []
+        outside = []
+
+        # the base axis (r_hor = 0) is not a border, the arm can reach across it
+        for di, dj in ((1, 0), (-1, 0), (0, 1), (0, -1)):
+            neighbour = padded[1 + di:padded.shape[0] - 1 + di, 1 + dj:padded.shape[1] - 1 + dj]
+            border = reachable & ~neighbour
+            inside.append(np.stack([r_hor[border], z[border]], axis=-1))
+            outside.append(inside[-1] + (di * self.step, dj * self.step))
+
+        inside_points = np.concatenate(inside)
+        outside_points = np.concatenate(outside)
+
+        for _ in range(self.REFINE_STEPS):
+            middle = (inside_points + outside_points) / 2
+            middle_reachable = self.solver.arm_angles(middle[:, 0], middle[:, 1])[3][:, None]
+            inside_points = np.where(middle_reachable, middle, inside_points)
+            outside_points = np.where(middle_reachable, outside_points, middle)
+
+        return inside_points
+
+    def load(self, cache_path: str) -> bool:
+        file_path = os.path.join(cache_path, self.FILE_NAME)
+
+        if not os.path.exists(file_path):
+            return False
+
+        try:
+            with np.load(file_path) as data:
+                if not np.array_equal(data["key"], self.key):
+                    return False
+
+                self.z_min = float(data["z_min"])
+                self.angles = data["angles"]
+                self.cells = data["cells"]
+                self.edge = data["edge"]
+        except (OSError, KeyError, ValueError):
+            return False
+
+        return True
+
+    def save(self, cache_path: str):
+        try:
+            os.makedirs(cache_path, exist_ok=True)
+            np.savez_compressed(
+                os.path.join(cache_path, self.FILE_NAME),
+                key=self.key,
+                z_min=self.z_min,
+                angles=self.angles,
+                cells=self.cells,
+                edge=self.edge,
+            )
+        except OSError:
+            pass
+
+    def coefficients(self) -> list:
+        """
+        Bilinear coefficients of each cell for the scalar lookups, as nested lists (faster to index than arrays):
+        None for the EMPTY cells, an empty tuple for the BORDER cells, 12 floats for the INNER cells
+        (constant, u, v and uv terms of shoulder, elbow and wrist).
+        """
+        a = self.angles[:-1, :-1]
+        b = self.angles[:-1, 1:]
+        c = self.angles[1:, :-1]
+        d = self.angles[1:, 1:]
+        terms = np.concatenate([a, c - a, b - a, a - b - c + d], axis=-1).tolist()
+        cells = self.cells.tolist()
+
+        return [
+            [None if cell == self.EMPTY else () if cell == self.BORDER else tuple(term) for cell, term in zip(cell_row, term_row)]
+            for cell_row, term_row in zip(cells, terms)
+        ]
+
+    def lookup(self, x: float, y: float, z: float) -> Optional[Tuple[tuple, float, float]]:
+        """
+        Cell of a target
+
+        :return: the coefficients of the cell (empty for BORDER cells) and the position of the target in it, None when the cell is EMPTY or out of the grid
+        """
+        if y < 0:
+            return None
+
+        u = sqrt(x ** 2 + y ** 2) / self.step
+        v = (z - self.z_min) / self.step
+        i = int(u)
+
+        if v < 0 or i >= len(self._coefficients):
+            return None
+
+        row = self._coefficients[i]
+        j = int(v)
+
+        if j >= len(row):
+            return None
+
+        cell = row[j]
+
+        if cell is None:
+            return None
+
+        return cell, u - i, v - j
+
+    def is_reachable(self, x: float, y: float, z: float) -> bool:
+        """
+        Check a target against the table, only the targets in BORDER cells are solved
+        """
+        found = self.lookup(x, y, z)
+
+        if found is None:
+            return False
+
+        if found[0]:
+            return True
+
+        try:
+            self.solver.move_to_position_cart(x, y, z)
+        except Exception:
+            return False
+
+        return True
+
+    def solve(self, x: float, y: float, z: float) -> Optional[Angles]:
+        """
+        Base, shoulder, elbow and wrist angles to reach a target.
+        Interpolated angles may differ by a degree from the ones of the Solver.
+
+        :param x: x coordinate
+        :param y: y coordinate
+        :param z: z coordinate
+        :return: the angles, None when the target is out of reach
+        """
+        found = self.lookup(x, y, z)
+
+        if found is None:
+            return None
+
+        cell, u, v = found
+
+        if not cell:
+            try:
+                return self.solver.move_to_position_cart(x, y, z)[:4]
+            except Exception:
+                return None
+
+        uv = u * v
+        shoulder = cell[0] + cell[3] * u + cell[6] * v + cell[9] * uv
+        elbow = cell[1] + cell[4] * u + cell[7] * v + cell[10] * uv
+        wrist = cell[2] + cell[5] * u + cell[8] * v + cell[11] * uv
+
+        if y == 0:
+            base = 180 if x <= 0 else 0
+        else:
+            base = 90 - degrees(atan(x / y))
+
+        return round(base), round(shoulder), round(elbow), round(wrist)
+
+    def solve_many(self, x, y, z) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Vectorized solve
+
+        :param x: array of x coordinates
+        :param y: array of y coordinates
+        :param z: array of z coordinates
+        :return: base, shoulder, elbow and wrist angle arrays (0 where unreachable) and the reachability mask
+        """
+        x, y, z = np.broadcast_arrays(np.asarray(x, dtype=float), np.asarray(y, dtype=float), np.asarray(z, dtype=float))
+        r_hor = np.sqrt(x ** 2 + y ** 2)
+
+        fi = r_hor / self.step
+        fj = (z - self.z_min) / self.step
+        inside = (y >= 0) & (fj >= 0) & (fi < self.cells.shape[0]) & (fj < self.cells.shape[1])
+        i = np.where(inside, fi, 0).astype(int)
+        j = np.where(inside, fj, 0).astype(int)
+        cell = np.where(inside, self.cells[i, j], self.EMPTY)
+
+        u = (fi - i)[..., None]
+        v = (fj - j)[..., None]
+        i1 = np.minimum(i + 1, self.angles.shape[0] - 1)
+        j1 = np.minimum(j + 1, self.angles.shape[1] - 1)
+        interpolated = (1 - u) * ((1 - v) * self.angles[i, j] + v * self.angles[i, j1]) + u * ((1 - v) * self.angles[i1, j] + v * self.angles[i1, j1])
+
+        base = np.round(self.solver.base_angles(x, y)).astype(int)
+        arm = np.round(interpolated).astype(int)
+        reachable = cell == self.INNER
+
+        border = cell == self.BORDER
+        if border.any():
+            b_base, b_shoulder, b_elbow, b_wrist, b_reachable = self.solver.move_to_positions_cart(x[border], y[border], z[border])
+            arm[border] = np.stack([b_shoulder, b_elbow, b_wrist], axis=-1)
+            reachable[border] = b_reachable
+
+        base = np.where(reachable, base, 0)
+        arm = np.where(reachable[..., None], arm, 0)
+        return base, arm[..., 0], arm[..., 1], arm[..., 2], reachable
+
+    def nearest(self, x: float, y: float, z: float) -> Point:
+        """
+        Reachable point nearest to a target, the target itself when it is reachable.
+        Targets behind the arm (y < 0) are first brought to y = 0.
+
+        :param x: x coordinate
+        :param y: y coordinate
+        :param z: z coordinate
+        :return: the clamped target
+        """
+        y = max(y, 0)
+
+        if self.is_reachable(x, y, z):
+            return x, y, z
+
+        # the workspace is symmetric around the base axis: clamp in the vertical plane of the target
+        r_hor = sqrt(x ** 2 + y ** 2)
+        distances = (self.edge[:, 0] - r_hor) ** 2 + (self.edge[:, 1] - z) ** 2
+        inside_r, inside_z = (float(v) for v in self.edge[int(np.argmin(distances))])
+
+        if r_hor:
+            return x * inside_r / r_hor, y * inside_r / r_hor, inside_z
+
+        return 0, inside_r, inside_z
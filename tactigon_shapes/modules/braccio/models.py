@@ -25,22 +25,67 @@ class CommandStatus(Enum):
     OUT_OF_RANGE = "3"
     TIMEOUT = "99"
 
+@dataclass
+class SimulatorConfig:
+    speed: float = 120
+    latency: float = 0.02
+    jitter: float = 0
+    loss: float = 0
+    disconnect: float = 0
+    interval: float = 0.015
+    mtu: int = 247
+    write_without_response: bool = True
+    seed: Optional[int] = None
+
+    @classmethod
+    def FromJSON(cls, json: dict):
+        return cls(
+                json["speed"] if "speed" in json else 120,
+                json["latency"] if "latency" in json else 0.02,
+                json["jitter"] if "jitter" in json else 0,
+                json["loss"] if "loss" in json else 0,
+                json["disconnect"] if "disconnect" in json else 0,
+                json["interval"] if "interval" in json else 0.015,
+                json["mtu"] if "mtu" in json else 247,
+                json["write_without_response"] if "write_without_response" in json else True,
+                json["seed"] if "seed" in json else None,
+            )
+
+    def toJSON(self) -> object:
+        return {
+            "speed": self.speed,
+            "latency": self.latency,
+            "jitter": self.jitter,
+            "loss": self.loss,
+            "disconnect": self.disconnect,
+            "interval": self.interval,
+            "mtu": self.mtu,
+            "write_without_response": self.write_without_response,
+            "seed": self.seed
+        }
+
 @dataclass
 class BraccioConfig:
     name: str
     address: str
+    clamp: bool = False
+    simulator: Optional[SimulatorConfig] = None
 
     @classmethod
     def FromJSON(cls, json: dict):
         return cls(
                 json["name"],
                 json["address"],
+                json["clamp"] if "clamp" in json else False,
+                SimulatorConfig.FromJSON(json["simulator"]) if "simulator" in json and json["simulator"] is not None else None,
             )
         
     def toJSON(self) -> object:
         return {
             "name": self.name,
-            "address": self.address
+            "address": self.address,
+            "clamp": self.clamp,
+            "simulator": self.simulator.toJSON() if self.simulator else None
         }
 
 @dataclass
@@ -0,0 +1,216 @@
+import asyncio
+import random
+from typing import Callable, List, Optional, Tuple
+
+from .models import Command, CommandStatus, SimulatorConfig
+
+Position = Tuple[float, float, float, float, float, float]
+
+class SimulatedCharacteristic:
+    properties: List[str]
+    max_write_without_response_size: int
+
+    def __init__(self, properties: List[str], max_write_without_response_size: int):
+        self.properties = properties
+        self.max_write_without_response_size = max_write_without_response_size
+
+class SimulatedArm:
+    """
+    Software Braccio speaking the BLE command protocol, to run the command pipeline without the arm.
+
+    Commands are the strings written by Braccio ("P,base,shoulder,elbow,wrist,wrist rotation,gripper|", "H|", "1|", "0|"),
+    executed one at a time and answered with a CommandStatus notification:
+        - OK once the servos reach the target, the motion takes the largest angular distance over the speed
+        - OUT_OF_RANGE for angles outside 0-180
+        - ERROR_1 for malformed commands
+        - ERROR_2 for moves while the arm is turned off
+
+    The link is simulated too: one way latency (plus jitter) on the commands and the notifications, writes timed
+    on the connection interval, lost commands or notifications and dropped connections.
+    The arm keeps its state across connections: use client as the client factory of Braccio.
+    """
+    HOME: Position = (90, 90, 90, 90, 90, 73)
+    SWITCH_TIME: float = 0.1
+    PACKETS_PER_EVENT: int = 4
+
+    config: SimulatorConfig
+    position: Position
+    powered: bool
+    commands: int
+    lost: int
+    disconnects: int
+    writes: int
+    written: int
+    _rng: random.Random
+    _lock: Optional[asyncio.Lock]
+
+    def __init__(self, config: Optional[SimulatorConfig] = None):
+        self.config = config or SimulatorConfig()
+        self.position = self.HOME
+        self.powered = True
+        self.commands = 0
+        self.lost = 0
+        self.disconnects = 0
+        self.writes = 0
+        self.written = 0
+        self._rng = random.Random(self.config.seed)
+        self._lock = None
+
+    def client(self, address: str) -> "SimulatedClient":
+        return SimulatedClient(self, address)
+
+    def stats(self) -> dict:
+        return dict(
+            commands=self.commands,
+            lost=self.lost,
+            disconnects=self.disconnects,
+            writes=self.writes,
+            written=self.written,
+        )
+
+    def delay(self) -> float:
+        return max(0, self.config.latency + self._rng.uniform(-self.config.jitter, self.config.jitter))
+
+    def chance(self, probability: float) -> bool:
+        return probability > 0 and self._rng.random() < probability
+
+    def apply(self, text: str) -> Tuple[CommandStatus, float]:
+        """
+        Execute a command on the simulated servos
+
+        :param text: command without the terminator
+        :return: status of the command and time to execute it
+        """
+        parts = text.split(",")
+
+        if parts[0] == Command.MOVE.value:
+            try:
+                values = tuple(float(v) for v in parts[1:])
+            except ValueError:
+                return CommandStatus.ERROR_1, 0
+
+            if len(values) != len(self.HOME):
+                return CommandStatus.ERROR_1, 0
+
+            if not self.powered:
+                return CommandStatus.ERROR_2, 0
+
+            if any(v < 0 or v > 180 for v in values):
+                return CommandStatus.OUT_OF_RANGE, 0
+
+            return CommandStatus.OK, self.travel(values)  # type: ignore
+
+        if len(parts) > 1:
+            return CommandStatus.ERROR_1, 0
+
+        if parts[0] == Command.HOME.value:
+            if not self.powered:
+                return CommandStatus.ERROR_2, 0
+
+            return CommandStatus.OK, self.travel(self.HOME)
+
+        if parts[0] in (Command.TURN_ON.value, Command.TURNO_OFF.value):
+            self.powered = parts[0] == Command.TURN_ON.value
+            return CommandStatus.OK, self.SWITCH_TIME
+
+        return CommandStatus.ERROR_1, 0
+
+    def travel(self, target: Position) -> float:
+        duration = max(abs(a - b) for a, b in zip(self.position, target)) / self.config.speed
+        self.position = target
+        return duration
+
+    async def execute(self, client: "SimulatedClient", text: str):
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+
+        async with self._lock:
+            await asyncio.sleep(self.delay())
+            status, duration = self.apply(text)
+            await asyncio.sleep(duration)
+
+        client.notify(status.value.encode())
+
+class SimulatedClient:
+    """
+    BleakClient stand-in connected to a SimulatedArm
+    """
+    arm: SimulatedArm
+    address: str
+    is_connected: bool
+    _callback: Optional[Callable]
+    _buffer: bytes
+
+    def __init__(self, arm: SimulatedArm, address: str):
+        self.arm = arm
+        self.address = address
+        self.is_connected = False
+        self._callback = None
+        self._buffer = b""
+        self._characteristic = SimulatedCharacteristic(
+            ["write", "write-without-response"] if arm.config.write_without_response else ["write"],
+            arm.config.mtu - 3
+        )
+
+    @property
+    def mtu_size(self) -> int:
+        return self.arm.config.mtu
+
+    @property
+    def services(self) -> "SimulatedClient":
+        return self
+
+    def get_characteristic(self, uuid: str) -> SimulatedCharacteristic:
+        return self._characteristic
+
+    async def connect(self):
+        await asyncio.sleep(self.arm.delay())
+        self.is_connected = True
+        self._buffer = b""
+
+    async def disconnect(self):
+        self.is_connected = False
+
+    async def start_notify(self, uuid: str, callback: Callable):
+        self._callback = callback
+
+    async def write_gatt_char(self, uuid: str, data: bytes, response: Optional[bool] = None):
+        if not self.is_connected:
+            raise ConnectionError(f"Simulated Braccio {self.address} not connected")
+
+        if response is None:
+            response = "write" in self._characteristic.properties
+
+        if len(data) > self.arm.config.mtu - 3:
+            raise ValueError(f"{len(data)} bytes do not fit the MTU ({self.arm.config.mtu})")
+
+        interval = self.arm.config.interval
+        await asyncio.sleep(2 * interval if response else interval / self.arm.PACKETS_PER_EVENT)
+
+        self.arm.writes += 1
+        self.arm.written += len(data)
+        self._buffer += data
+
+        while b"|" in self._buffer:
+            command, _, self._buffer = self._buffer.partition(b"|")
+            self.arm.commands += 1
+
+            if self.arm.chance(self.arm.config.loss):
+                self.arm.lost += 1
+            else:
+                asyncio.ensure_future(self.arm.execute(self, command.decode(errors="replace")))
+
+            if self.arm.chance(self.arm.config.disconnect):
+                self.arm.disconnects += 1
+                self.is_connected = False
+
+    def notify(self, data: bytes):
+        if self.arm.chance(self.arm.config.loss):
+            self.arm.lost += 1
+            return
+
+        asyncio.get_event_loop().call_later(self.arm.delay(), self._deliver, data)
+
+    def _deliver(self, data: bytes):
+        if self.is_connected and self._callback:
+            self._callback(None, bytearray(data))
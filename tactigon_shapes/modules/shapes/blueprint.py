@@ -9,6 +9,7 @@ from .extension import ShapeConfig, Program
 from .manager import get_shapes_app
 
 from ..tskin.manager import get_tskin
+from ..tskin.replay import ReplayTSkin
 from ..zion.manager import get_zion_interface
 
 from ...config import app_config, check_config
@@ -64,8 +65,7 @@ def index(program_id: Optional[str] = None):
 
     return render_template("shapes/index.jinja",
                            current_config=current_config,
-                           current_running_program=_shapes.current_id,
-                           is_running=_shapes.is_running,
+                           running_programs=_shapes.running_ids,
                            state=json.dumps(state),
                            shapes_config=_shapes.config,
                            blocks_config=blocks_config,
@@ -190,6 +190,7 @@ def save_config(program_id: str):
 
     config.name = program_name
     config.description = program_description
+    config.isolated = get_from_request('isolated') is not None
     config.modified_on = datetime.now()
 
     _shapes.save_config(config=config)
@@ -283,6 +284,10 @@ def save_program(program_id: str):
         flash(f"Something went wrong!", category="danger")
         return redirect(url_for("shapes.edit", program_id=program_id))
 
+    if _shapes.reload(config.id):
+        flash(f"Shape saved and reloaded.", category="success")
+        return redirect(url_for("shapes.index", program_id=program_id))
+
     flash(f"Shape saved.", category="success")
     return redirect(url_for("shapes.index", program_id=program_id))
 
@@ -308,7 +313,7 @@ def start(program_id: str):
         flash(f"Tactigon skin not found!", category="danger")
         return redirect(url_for("main.index"))
 
-    status = _shapes.start(program.id, tskin)
+    status = _shapes.start(program.id, tskin, record=get_from_request("record") is not None)
 
     if status is None:
         flash(f"{program.name} does not exists!", category="danger")
@@ -324,6 +329,97 @@ def start(program_id: str):
     return redirect(url_for("shapes.index", program_id=program_id))
 
 
+def parse_time(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+
+@bp.route("/<string:program_id>/logs")
+@check_config
+def logs(program_id: str):
+    _shapes = get_shapes_app()
+
+    if not _shapes:
+        return {"error": "Shapes app not found"}, 500
+
+    program = _shapes.find_shape_by_id(UUID(program_id))
+
+    if not program:
+        return {"error": "Shape not found"}, 404
+
+    severity = get_from_request("severity")
+
+    try:
+        since = parse_time(get_from_request("since"))
+        until = parse_time(get_from_request("until"))
+        page = max(0, int(get_from_request("page") or 0))
+        size = min(1000, max(1, int(get_from_request("size") or 100)))
+    except ValueError as e:
+        return {"error": str(e)}, 400
+
+    return _shapes.query_logs(
+        program.id,
+        get_from_request("run"),
+        [s.strip().upper() for s in severity.split(",")] if severity else None,
+        since,
+        until,
+        page,
+        size
+    )
+
+
+@bp.route("/<string:program_id>/recordings")
+@check_config
+def recordings(program_id: str):
+    _shapes = get_shapes_app()
+
+    if not _shapes:
+        return {"error": "Shapes app not found"}, 500
+
+    return {"recordings": _shapes.get_recordings(UUID(program_id))}
+
+
+@bp.route("/<string:program_id>/replay/<string:recording>")
+@check_config
+def replay(program_id: str, recording: str):
+    _shapes = get_shapes_app()
+
+    if not _shapes:
+        flash(f"Shapes app not found!", category="danger")
+        return redirect(url_for("main.index"))
+
+    program = _shapes.find_shape_by_id(UUID(program_id))
+
+    if not program:
+        flash(f"Shape not found!", category="danger")
+        return redirect(url_for("shapes.index"))
+
+    recording_file = _shapes.get_recording(program.id, recording)
+
+    if not recording_file:
+        flash(f"Recording {recording} not found!", category="danger")
+        return redirect(url_for("shapes.index", program_id=program_id))
+
+    try:
+        speed = float(get_from_request("speed") or 1)
+    except ValueError:
+        speed = 1
+
+    status = _shapes.start(program.id, ReplayTSkin.FromFile(recording_file, speed if speed > 0 else 1))  # type: ignore
+
+    if not status or status[0] is False:
+        flash(f"Failed to replay {program.name}. {status[1] if status else ''}", category="danger")
+        return redirect(url_for("shapes.index", program_id=program_id))
+
+    flash(f"Replaying {recording} on {program.name}", category="success")
+    return redirect(url_for("shapes.index", program_id=program_id))
+
+
 @bp.route("/<string:program_id>/stop")
 @check_config
 def stop(program_id: str):
@@ -333,8 +429,7 @@ def stop(program_id: str):
         flash(f"Shapes app not found!", category="danger")
         return redirect(url_for("main.index"))
 
-    _shapes.stop()
-    _shapes.current_id = None
+    _shapes.stop(UUID(program_id))
 
     program = _shapes.find_shape_by_id(UUID(program_id))
 
@@ -347,6 +442,22 @@ def stop(program_id: str):
     return redirect(url_for("shapes.index", program_id=program_id))
 
 
+@bp.route("/<string:program_id>/profile")
+@check_config
+def profile(program_id: str):
+    _shapes = get_shapes_app()
+
+    if not _shapes:
+        return {"error": "Shapes app not found"}, 500
+
+    data = _shapes.get_profile(UUID(program_id))
+
+    if data is None:
+        return {"error": "Shape not running"}, 404
+
+    return data
+
+
 @bp.route("/<string:program_id>/delete")
 @check_config
 def delete(program_id: str):
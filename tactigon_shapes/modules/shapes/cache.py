@@ -0,0 +1,90 @@
+import hashlib
+import importlib.util
+import marshal
+import os
+from os import path
+from types import CodeType
+from typing import Optional
+
+
+class ProgramCache:
+    """
+    Bytecode cache of a shape program, stored next to its state.json.
+    The cache is keyed on the hash of the program source so any rewrite of the code invalidates it.
+    """
+    CACHE_FILE: str = "program.cache"
+
+    program_file: str
+
+    def __init__(self, program_file: str):
+        self.program_file = program_file
+
+    @property
+    def cache_file(self) -> str:
+        return path.join(path.dirname(self.program_file), self.CACHE_FILE)
+
+    @staticmethod
+    def header(source: bytes) -> bytes:
+        return importlib.util.MAGIC_NUMBER + hashlib.sha256(source).digest()
+
+    def load(self) -> CodeType:
+        """
+        Get the compiled program, from the cache when it matches the current source
+
+        :return: program code object
+        """
+        with open(self.program_file, "rb") as program_file:
+            source = program_file.read()
+
+        header = self.header(source)
+        code = self.read(header)
+
+        if code is None:
+            code = compile(source, self.program_file, "exec", dont_inherit=True)
+            self.write(header, code)
+
+        return code
+
+    def read(self, header: bytes) -> Optional[CodeType]:
+        try:
+            with open(self.cache_file, "rb") as cache_file:
+                data = cache_file.read()
+        except OSError:
+            return None
+
+        if not data.startswith(header):
+            return None
+
+        try:
+            return marshal.loads(data[len(header):])
+        except (EOFError, ValueError, TypeError):
+            return None
+
+    def write(self, header: bytes, code: CodeType):
+        tmp_file = self.cache_file + ".tmp"
+        try:
+            with open(tmp_file, "wb") as cache_file:
+                cache_file.write(header + marshal.dumps(code))
+            os.replace(tmp_file, self.cache_file)
+        except OSError:
+            pass
+
+    def invalidate(self):
+        try:
+            os.remove(self.cache_file)
+        except OSError:
+            pass
+
+    def build(self) -> bool:
+        """
+        Drop the current cache and compile the program again
+
+        :return: True if the program compiles
+        """
+        self.invalidate()
+        try:
+            self.load()
+        except (SyntaxError, ValueError, OSError):
+            return False
+
+        return True
@@ -3,23 +3,35 @@ import json
 import shutil
 import sys
 import time
-from queue import Queue
+from functools import partial
+from collections import deque
+from queue import Empty
+from threading import Thread, Lock
+from types import ModuleType
 from uuid import UUID
 from datetime import datetime
 from dataclasses import dataclass, field
 from enum import Enum
-from os import path, makedirs
-from typing import List, Optional, Tuple, Any
+from os import path, makedirs, listdir
+from typing import Callable, Deque, Dict, List, Optional, Tuple, Union, Any, TYPE_CHECKING
 
 from flask import Flask
 from pynput.keyboard import Controller as KeyboardController
 
 from ..braccio.extension import BraccioInterface, Wrist, Gripper
 from ..zion.extension import ZionInterface
-from ..tskin.models import ModelGesture, TSkin, OneFingerGesture, TwoFingerGesture, TSpeechObject
+from ..tskin.models import ModelGesture, TSkin, TSkinFanout, TSkinSubscriber, OneFingerGesture, TwoFingerGesture, TSpeechObject
 from ..tskin.manager import walk
+from ..tskin.replay import TSkinRecorder
+from .cache import ProgramCache
+from .profiler import TickProfiler, ProfiledProxy
+from .logstore import LogWriter, query_logs
 
 from ...extensions.base import ExtensionThread, ExtensionApp
+from ...utils.metrics import gauge_samples, histogram_samples
+
+if TYPE_CHECKING:
+    from .runner import ProcessShapeThread
 
 class Severity(Enum):
     DEBUG = 0
@@ -44,6 +56,7 @@ class ShapeConfig:
     description: Optional[str] = None
     readonly: bool = False
     app_file: str = "program.py"
+    isolated: bool = False
 
     @classmethod
     def FromJSON(cls, json):
@@ -53,7 +66,8 @@ class ShapeConfig:
             datetime.fromisoformat(json["created_on"]),
             datetime.fromisoformat(json["modified_on"]),
             json["description"],
-            json["readonly"]
+            json["readonly"],
+            isolated=json["isolated"] if "isolated" in json else False
         )
 
     def toJSON(self) -> dict:
@@ -63,7 +77,8 @@ class ShapeConfig:
             created_on=self.created_on.isoformat(),
             modified_on=self.modified_on.isoformat(),
             description=self.description,
-            readonly=self.readonly
+            readonly=self.readonly,
+            isolated=self.isolated
         )
     
 @dataclass
@@ -71,6 +86,8 @@ class DebugMessage:
     severity: Severity
     date: datetime
     message: str
+    repeat: int = 1
+    last_date: Optional[datetime] = None
 
     @classmethod
     def Debug(cls, message: str):
@@ -108,26 +125,198 @@ class DebugMessage:
         return dict(
             severity=self.severity.name,
             date=self.date.isoformat(),
-            message=self.message
+            message=self.message,
+            repeat=self.repeat,
+            last_date=self.last_date.isoformat() if self.last_date else None
+        )
+
+LogRecord = Tuple[Severity, float, str, int, float]
+
+class LoggingQueue:
+    """
+    Bounded ring buffer of the log messages of a shape.
+    When full, the oldest message is dropped and counted under its severity.
+    Messages are stored as (severity, monotonic time, message, repeat, last time) and become DebugMessage only when popped.
+
+    A message equal to the previous one, arriving within the coalesce window, is not stored again:
+    the repeats are counted and stored as a single record once the window has passed or another message arrives.
+
+    With a sink, every stored record is also passed to it (see LogWriter), before any drop.
+    """
+    CAPACITY: int = 1000
+    COALESCE_WINDOW: float = 1
+    EPOCH: float = time.time() - time.monotonic()
+
+    capacity: int
+    coalesce_window: float
+    _records: Deque[LogRecord]
+    _dropped: Dict[Severity, int]
+    _lock: Lock
+    _last: Optional[Tuple[Severity, str]]
+    _last_time: float
+    _run: Optional[List[Any]]
+    _sink: Optional[Callable[[LogRecord], None]]
+
+    def __init__(self, capacity: Optional[int] = None, coalesce_window: Optional[float] = None, sink: Optional[Callable[[LogRecord], None]] = None):
+        self.capacity = capacity if capacity else self.CAPACITY
+        self.coalesce_window = coalesce_window if coalesce_window is not None else self.COALESCE_WINDOW
+        self._records = deque(maxlen=self.capacity)
+        self._dropped = {s: 0 for s in Severity}
+        self._lock = Lock()
+        self._last = None
+        self._last_time = 0
+        self._run = None
+        self._sink = sink
+
+    @property
+    def depth(self) -> int:
+        return len(self._records)
+
+    @property
+    def dropped(self) -> Dict[str, int]:
+        with self._lock:
+            return {s.name: count for s, count in self._dropped.items()}
+
+    @property
+    def stats(self) -> dict:
+        return dict(depth=self.depth, capacity=self.capacity, dropped=self.dropped)
+
+    def qsize(self) -> int:
+        return self.depth
+
+    def empty(self) -> bool:
+        return not self._records
+
+    def put(self, severity: Severity, message: str, timestamp: Optional[float] = None):
+        """
+        Store a message
+
+        :param severity: message severity
+        :param message: message
+        :param timestamp: time.monotonic() of the message, defaults to now
+        """
+        timestamp = timestamp if timestamp is not None else time.monotonic()
+
+        with self._lock:
+            if self.coalesce_window and self._last == (severity, message) and timestamp - self._last_time <= self.coalesce_window:
+                self._last_time = timestamp
+
+                if self._run is None:
+                    self._run = [severity, timestamp, message, 1, timestamp]
+                else:
+                    self._run[3] += 1
+                    self._run[4] = timestamp
+
+                if timestamp - self._run[1] >= self.coalesce_window:
+                    self._flush_run()
+                return
+
+            self._flush_run()
+            self._append((severity, timestamp, message, 1, timestamp))
+            self._last = (severity, message)
+            self._last_time = timestamp
+
+    def _append(self, record: LogRecord):
+        if len(self._records) == self.capacity:
+            self._dropped[self._records[0][0]] += 1
+        self._records.append(record)
+
+        if self._sink:
+            self._sink(record)
+
+    def _flush_run(self, older_than: Optional[float] = None):
+        if self._run is None:
+            return
+
+        if older_than is not None and self._run[1] > older_than:
+            return
+
+        self._append(tuple(self._run))  # type: ignore
+        self._run = None
+
+    def close(self):
+        """
+        Store the pending repeats, if any
+        """
+        with self._lock:
+            self._flush_run()
+
+    def put_nowait(self, item: DebugMessage):
+        self.put(item.severity, item.message, item.date.timestamp() - self.EPOCH)
+
+    def get_nowait(self) -> DebugMessage:
+        with self._lock:
+            self._flush_run(time.monotonic() - self.coalesce_window)
+            if not self._records:
+                raise Empty
+            record = self._records.popleft()
+
+        return self.format(record)
+
+    def format(self, record: LogRecord) -> DebugMessage:
+        severity, timestamp, message, repeat, last_timestamp = record
+        return DebugMessage(
+            severity,
+            datetime.fromtimestamp(self.EPOCH + timestamp),
+            message,
+            repeat,
+            datetime.fromtimestamp(self.EPOCH + last_timestamp) if repeat > 1 else None
         )
 
-class LoggingQueue(Queue):
+    @classmethod
+    def record_toJSON(cls, record: LogRecord) -> dict:
+        severity, timestamp, message, repeat, last_timestamp = record
+        return dict(
+            time=round(cls.EPOCH + timestamp, 6),
+            date=datetime.fromtimestamp(cls.EPOCH + timestamp).isoformat(),
+            severity=severity.name,
+            message=message,
+            repeat=repeat,
+            last_time=round(cls.EPOCH + last_timestamp, 6)
+        )
+
+    def drain(self, limit: int) -> List[DebugMessage]:
+        """
+        Pop the pending messages, oldest first
+
+        :param limit: maximum number of messages to pop
+        :return: popped messages
+        """
+        with self._lock:
+            self._flush_run(time.monotonic() - self.coalesce_window)
+            records = [self._records.popleft() for _ in range(min(limit, len(self._records)))]
+
+        return [self.format(record) for record in records]
+
     def debug(self, msg):
-        self.put_nowait(DebugMessage.Debug(msg))
+        self.put(Severity.DEBUG, msg)
 
     def info(self, msg):
-        self.put_nowait(DebugMessage.Info(msg))
+        self.put(Severity.INFO, msg)
 
     def warning(self, msg):
-        self.put_nowait(DebugMessage.Warning(msg))
+        self.put(Severity.WARNING, msg)
 
     def error(self, msg):
-        self.put_nowait(DebugMessage.Error(msg))
+        self.put(Severity.ERROR, msg)
 
 class ShapeThread(ExtensionThread):
     MODULE_NAME: str = "ShapeThreadModule"
     TOUCH_DEBOUCE_TIME: float = 0.05
     TOUCH_DEBOUNCE_TIMEOUT: float = 0.2
+    EVENT_DRIVEN: bool = False
+    HEARTBEAT: float = 0.5
+    CONTINUOUS_SENSORS: Tuple[str, ...] = ("tskin.angle", "tskin.gyro", "tskin.acceleration")
+    SPEECH_METHODS: Tuple[str, ...] = ("listen", "record", "play")
+
+    event_driven: bool
+    heartbeat: float
+    profiler: TickProfiler
+
+    module: ModuleType
+    program_file: str
+    _module_lock: Lock
+    _pending_module: Optional[Tuple[ModuleType, bool]]
 
     _tskin: TSkin
     _keyboard: KeyboardController
@@ -135,16 +324,36 @@ class ShapeThread(ExtensionThread):
     _braccio_interface: Optional[BraccioInterface] = None
     _zion_interface: Optional[ZionInterface] = None
 
-    def __init__(self, base_path: str, app: ShapeConfig, keyboard: KeyboardController, braccio: Optional[BraccioInterface], zion: Optional[ZionInterface], logging_queue: LoggingQueue, tskin: TSkin):
+    def __init__(self, base_path: str, app: ShapeConfig, keyboard: KeyboardController, braccio: Optional[BraccioInterface], zion: Optional[ZionInterface], logging_queue: LoggingQueue, tskin: TSkin, event_driven: Optional[bool] = None, heartbeat: Optional[float] = None):
+        self.profiler = TickProfiler(self.TICK)
         self._keyboard = keyboard
         self._tskin = tskin
         self._logging_queue = logging_queue
-        self._braccio_interface = braccio
-        self._zion_interface = zion
+        self.braccio_interface = braccio
+        self.zion_interface = zion
+        self._profiled_tskin = ProfiledProxy(tskin, "speech", self.profiler, self.SPEECH_METHODS)
+        self._profiled_keyboard = ProfiledProxy(keyboard, "keyboard", self.profiler)
+        self.heartbeat = heartbeat if heartbeat is not None else self.HEARTBEAT
 
         ExtensionThread.__init__(self)
 
-        self.load_module(path.join(base_path, "programs", app.id.hex, "program.py"))
+        self._module_lock = Lock()
+        self._pending_module = None
+
+        _event_driven = event_driven if event_driven is not None else self.EVENT_DRIVEN
+        self._event_driven_preference = _event_driven and hasattr(tskin, "wait_event")
+        self._event_id = tskin.event_id if self._event_driven_preference else 0
+
+        self.program_file = path.join(base_path, "programs", app.id.hex, "program.py")
+        self.load_module(self.program_file)
+
+    @property
+    def tskin(self) -> TSkin:
+        return self._tskin
+
+    @property
+    def logging_queue(self) -> LoggingQueue:
+        return self._logging_queue
 
     @property
     def braccio_interface(self) -> Optional[BraccioInterface]:
@@ -153,6 +362,7 @@ class ShapeThread(ExtensionThread):
     @braccio_interface.setter
     def braccio_interface(self, braccio_interface: Optional[BraccioInterface]):
         self._braccio_interface = braccio_interface
+        self._profiled_braccio = ProfiledProxy(braccio_interface, "braccio", self.profiler) if braccio_interface else None
 
     @property
     def zion_interface(self) -> Optional[ZionInterface]:
@@ -161,6 +371,7 @@ class ShapeThread(ExtensionThread):
     @zion_interface.setter
     def zion_interface(self, zion_interface: Optional[ZionInterface]):
         self._zion_interface = zion_interface
+        self._profiled_zion = ProfiledProxy(zion_interface, "zion", self.profiler) if zion_interface else None
 
     @staticmethod
     def debouce(tskin: Optional[TSkin]) -> bool:
@@ -180,43 +391,141 @@ class ShapeThread(ExtensionThread):
             
         return False
 
+    @staticmethod
+    def reads_continuous_sensors(source: str) -> bool:
+        """
+        Check if a program reads sensors that change on every sample (angle, gyro...).
+        Those programs need the fixed tick and cannot wait for discrete events.
+        Programs counting ticks (tap and hold counters...) are not detected: event driven mode is opt-in (EVENT_DRIVEN).
+
+        :param source: program file
+        :return: True if the program polls continuous sensors
+        """
+        with open(source, encoding="utf-8") as program_file:
+            code = program_file.read()
+
+        return any(sensor in code for sensor in ShapeThread.CONTINUOUS_SENSORS)
+
+    def wait(self, timeout: float):
+        if not self.event_driven:
+            return ExtensionThread.wait(self, timeout)
+
+        self._event_id = self._tskin.wait_event(self._event_id, self.heartbeat)
+
+    def stop(self):
+        self._stop_event.set()
+
+        if self.event_driven:
+            self._tskin.notify_event()
+
+        ExtensionThread.stop(self)
+
     def main(self):       
+        if self._pending_module:
+            self.swap_module()
+
         actions: List[Tuple[ShapesPostAction, Any]] = []
+        self.profiler.start_tick()
         try:
-            self.module.app(self._tskin, self._keyboard, self.braccio_interface, self.zion_interface, actions, self._logging_queue)
+            self.module.app(self._profiled_tskin, self._profiled_keyboard, self._profiled_braccio, self._profiled_zion, actions, self._logging_queue)
         except Exception as e:
             self._logging_queue.error(str(e))
+        finally:
+            self.profiler.end_tick()
+
+    @property
+    def profile(self) -> dict:
+        profile = self.profiler.toJSON()
+        profile.update(missed_deadlines=self.missed_deadlines, last_tick_duration=self.last_tick_duration)
+        return profile
+
+    def build_module(self, source: str) -> Tuple[ModuleType, bool]:
+        """
+        reads file source and builds it as a module, using the program bytecode cache
+
+        :param source: file to load
+        :return: built module and whether it reads continuous sensors
+        """
+        spec = importlib.util.spec_from_file_location(self.MODULE_NAME, source)
+        module = importlib.util.module_from_spec(spec)  # type: ignore
+        exec(ProgramCache(source).load(), module.__dict__)
+        return module, self.reads_continuous_sensors(source)
+
+    def set_module(self, module: ModuleType, continuous: bool):
+        self.module = module
+        sys.modules[self.MODULE_NAME] = module
+        self.event_driven = self._event_driven_preference and not continuous
+        self.fixed_rate = not self.event_driven
 
     def load_module(self, source: str):
         """
         reads file source and loads it as a module
 
         :param source: file to load
-        :param module_name: name of module to register in sys.modules
-        :return: loaded module
         """
-        spec = importlib.util.spec_from_file_location(self.MODULE_NAME, source)
-        self.module = importlib.util.module_from_spec(spec)  # type: ignore
-        sys.modules[self.MODULE_NAME] = self.module
-        spec.loader.exec_module(self.module)  # type: ignore
+        self.set_module(*self.build_module(source))
+
+    def reload(self, source: Optional[str] = None):
+        """
+        Compile the program again in background and swap it in between two ticks.
+        If the new program does not build, the current one keeps running.
+
+        :param source: file to load, defaults to the running program file
+        """
+        Thread(target=self._reload, args=(source or self.program_file,), daemon=True).start()
+
+    def _reload(self, source: str):
+        try:
+            pending_module = self.build_module(source)
+        except Exception as e:
+            self._logging_queue.error(f"Reload failed, keeping the running program. {e}")
+            return
+
+        with self._module_lock:
+            self._pending_module = pending_module
+
+        if self.event_driven:
+            self._tskin.notify_event()
+
+    def swap_module(self):
+        with self._module_lock:
+            pending_module, self._pending_module = self._pending_module, None
+
+        if pending_module:
+            self.set_module(*pending_module)
+            self._logging_queue.info("Program reloaded")
 
 
 class ShapesApp(ExtensionApp):
+    RECORDING_EXTENSION: str = ".rec.gz"
+    LOG_FLUSH_TIMEOUT: float = 2
+    log_capacity: int = LoggingQueue.CAPACITY
+    log_coalesce_window: float = LoggingQueue.COALESCE_WINDOW
+
     config_file_path: str
     config: List[ShapeConfig]
     shapes_file_path: str
     keyboard: KeyboardController
-    current_id: Optional[UUID] = None
-    logging_queue: LoggingQueue
+    event_driven: bool = ShapeThread.EVENT_DRIVEN
+    heartbeat: float = ShapeThread.HEARTBEAT
 
     _braccio_interface: Optional[BraccioInterface] = None
     _zion_interface: Optional[ZionInterface] = None
+    _threads: Dict[UUID, Union[ShapeThread, "ProcessShapeThread"]]
+    _runs: Dict[UUID, str]
+    log_writer: LogWriter
+    _fanouts: Dict[int, TSkinFanout]
+    _fanouts_lock: Lock
 
     def __init__(self, config_path: str, flask_app: Optional[Flask] = None):
         self.config_file_path = path.join(config_path, "config.json")
         self.shapes_file_path = config_path
         self.keyboard = KeyboardController()
-        self.logging_queue = LoggingQueue()
+        self._threads = {}
+        self._runs = {}
+        self._fanouts = {}
+        self._fanouts_lock = Lock()
+        self.log_writer = LogWriter(config_path, LoggingQueue.record_toJSON)
 
         if sys.platform == "darwin":
             self.hotkey_list = [("<ctrl>+", "ctrl"), ("<cmd>+", "cmd"), ("<shift>+", "shift"), ("<alt>+", "alt"), ("<cmd>+<alt>+", "cmd+alt"), ("<cmd>+<shift>+", "cmd+shift")]
@@ -250,12 +559,46 @@ class ShapesApp(ExtensionApp):
     def zion_interface(self, zion_interface: Optional[ZionInterface]):
         self._zion_interface = zion_interface
 
-    def get_log(self) -> Optional[DebugMessage]:
-        try:
-            return self.logging_queue.get_nowait()
-        except:
+    @property
+    def is_running(self) -> bool:
+        return any(thread.is_running for thread in self._threads.values())
+
+    @property
+    def running_ids(self) -> List[UUID]:
+        return [config_id for config_id, thread in self._threads.items() if thread.is_running]
+
+    def is_shape_running(self, config_id: UUID) -> bool:
+        thread = self._threads.get(config_id)
+        return thread.is_running if thread else False
+
+    def get_profile(self, config_id: UUID) -> Optional[dict]:
+        thread = self._threads.get(config_id)
+        return thread.profile if thread else None
+
+    def get_logs(self, config_id: UUID, limit: int) -> Tuple[List[DebugMessage], int]:
+        """
+        Pop the pending log messages of a running shape
+
+        :param config_id: shape id
+        :param limit: maximum number of messages to pop
+        :return: messages, oldest first, and the number of messages still queued
+        """
+        thread = self._threads.get(config_id)
+
+        if not thread:
+            return [], 0
+
+        messages = thread.logging_queue.drain(limit)
+        return messages, thread.logging_queue.depth
+
+    def get_log_stats(self, config_id: UUID) -> Optional[dict]:
+        thread = self._threads.get(config_id)
+
+        if not thread:
             return None
 
+        return thread.logging_queue.stats
+
     def get_state(self, program_id: UUID) -> Optional[dict]:
         try:
             folder_path = path.join(self.shapes_file_path, "programs", program_id.hex)
@@ -290,6 +633,7 @@ class ShapesApp(ExtensionApp):
                     cfg.description = cfg.description
                     cfg.readonly = config.readonly
                     cfg.app_file = config.app_file
+                    cfg.isolated = config.isolated
                     cfg.created_on = config.created_on
                     cfg.modified_on = config.modified_on
                     found = True
@@ -305,6 +649,19 @@ class ShapesApp(ExtensionApp):
         self.save_config(config)
         return self.__create_or_update_files(config.id, program)
 
+    def reload(self, config_id: UUID) -> bool:
+        """
+        Hot reload a running shape with its saved program, keeping its thread and handles
+
+        :param config_id: shape id
+        :return: True if the shape is running and the reload has been scheduled
+        """
+        if not self.is_shape_running(config_id):
+            return False
+
+        self._threads[config_id].reload()
+        return True
+
     def remove(self, program_id: UUID):
         filtered_programs = [c for c in self.config if c.id != program_id]
 
@@ -382,9 +739,64 @@ class ShapesApp(ExtensionApp):
 
         return Program(state, code)
 
-    def start(self, config_id: UUID, tskin: TSkin) -> Optional[Tuple[bool, str]]:
-        if self.is_running:
-            self.stop()
+    def subscribe(self, tskin: TSkin) -> TSkinSubscriber:
+        """
+        Subscribe to the TSkinFanout of a TSkin. Every TSkin (the device, each replay) has its own fanout,
+        shared by all the shapes reading it.
+
+        :param tskin: TSkin to read
+        :return: new subscriber
+        """
+        with self._fanouts_lock:
+            fanout = self._fanouts.get(id(tskin))
+
+            if fanout is None or fanout.tskin is not tskin:
+                fanout = self._fanouts[id(tskin)] = TSkinFanout(tskin)
+
+            return fanout.subscribe()
+
+    def unsubscribe(self, subscriber: Union[TSkinSubscriber, TSkinRecorder]):
+        """
+        Close a subscriber and drop the fanouts left without subscribers
+        """
+        subscriber.close()
+
+        with self._fanouts_lock:
+            self._fanouts = {key: fanout for key, fanout in self._fanouts.items() if fanout.subscribers}
+
+    def get_recordings_path(self, config_id: UUID) -> str:
+        return path.join(self.shapes_file_path, "programs", config_id.hex, "recordings")
+
+    def get_recordings(self, config_id: UUID) -> List[str]:
+        """
+        List the TSkin recordings of a shape, newest first
+
+        :param config_id: shape id
+        :return: recording file names
+        """
+        recordings_path = self.get_recordings_path(config_id)
+
+        if not path.exists(recordings_path):
+            return []
+
+        return sorted((f for f in listdir(recordings_path) if f.endswith(self.RECORDING_EXTENSION)), reverse=True)
+
+    def get_recording(self, config_id: UUID, name: str) -> Optional[str]:
+        if name not in self.get_recordings(config_id):
+            return None
+
+        return path.join(self.get_recordings_path(config_id), name)
+
+    def start(self, config_id: UUID, tskin: TSkin, record: bool = False) -> Optional[Tuple[bool, str]]:
+        """
+        Start a shape next to the ones already running. All the shapes share the same TSkin.
+
+        :param config_id: shape id
+        :param tskin: TSkin to read, can be a ReplayTSkin
+        :param record: record the TSkin input the shape sees in its recordings folder
+        :return: None if the shape does not exist, otherwise the start status and error
+        """
+        self.stop(config_id)
 
         for _config in self.config:
             if _config.id == config_id:
@@ -394,28 +806,96 @@ class ShapesApp(ExtensionApp):
                 if current_program.code is None:
                     return (False, "Code not found")
 
-                self.current_id = _config.id
+                run = self.log_writer.begin_run(_config.id.hex)
+                logging_queue = LoggingQueue(self.log_capacity, self.log_coalesce_window, partial(self.log_writer.write, _config.id.hex, run))
+
+                subscriber = self.subscribe(tskin)
                 try:
-                    self.thread = ShapeThread(self.shapes_file_path, _config, self.keyboard, self.braccio_interface, self.zion_interface, self.logging_queue, tskin)
-                    self.thread.start()
+                    if record:
+                        recordings_path = self.get_recordings_path(_config.id)
+                        makedirs(recordings_path, exist_ok=True)
+                        subscriber = TSkinRecorder(subscriber, path.join(recordings_path, datetime.now().strftime("%Y%m%d-%H%M%S") + self.RECORDING_EXTENSION))  # type: ignore
+
+                    if _config.isolated:
+                        from .runner import ProcessShapeThread
+                        thread = ProcessShapeThread(self.shapes_file_path, _config, self.braccio_interface, self.zion_interface, logging_queue, subscriber, self.event_driven, self.heartbeat)  # type: ignore
+                    else:
+                        thread = ShapeThread(self.shapes_file_path, _config, self.keyboard, self.braccio_interface, self.zion_interface, logging_queue, subscriber, self.event_driven, self.heartbeat)  # type: ignore
+                    thread.start()
                 except Exception as e:
-                    self.current_id = None
-                    if self.thread:
-                        try:
-                            self.thread.stop()
-                        except:
-                            pass
-                    self.thread = None
+                    self.unsubscribe(subscriber)
+                    self.log_writer.close_run(_config.id.hex, run)
                     return (False, str(e))
+
+                self._threads[_config.id] = thread
+                self._runs[_config.id] = run
                 return (True, "")
 
         return None
     
-    def stop(self):
-        ExtensionApp.stop(self)
-        while True:
-            if not self.get_log():
-                break
+    def stop(self, config_id: Optional[UUID] = None):
+        """
+        Stop a running shape, or all of them
+
+        :param config_id: shape id, None to stop every shape
+        """
+        config_ids = [config_id] if config_id else list(self._threads)
+
+        for _id in config_ids:
+            thread = self._threads.pop(_id, None)
+
+            if not thread:
+                continue
+
+            thread.stop()
+
+            if isinstance(thread.tskin, (TSkinSubscriber, TSkinRecorder)):
+                self.unsubscribe(thread.tskin)
+
+            thread.logging_queue.close()
+            run = self._runs.pop(_id, None)
+            if run:
+                self.log_writer.close_run(_id.hex, run)
+
+        if config_id is None:
+            self.log_writer.flush(self.LOG_FLUSH_TIMEOUT)
+
+    def metrics(self) -> List[str]:
+        """
+        Prometheus samples of the running shapes, read from their profilers and log queues
+        """
+        names = {c.id: c.name for c in self.config}
+        threads = list(self._threads.items())
+        labels = [(_id.hex, names.get(_id, "")) for _id, _ in threads]
+        profiles = [thread.profile or {} for _, thread in threads]
+        stats = [thread.logging_queue.stats for _, thread in threads]
+
+        lines = gauge_samples("tactigon_shapes_running", "Running shapes", (), [((), len(threads))])
+        lines += gauge_samples("tactigon_shape_ticks_total", "Ticks run by the shape", ("program", "name"), [(l, p.get("ticks", 0)) for l, p in zip(labels, profiles)], "counter")
+        lines += gauge_samples("tactigon_shape_ticks_over_budget_total", "Ticks longer than the tick period", ("program", "name"), [(l, p.get("over_budget", 0)) for l, p in zip(labels, profiles)], "counter")
+        lines += gauge_samples("tactigon_shape_missed_deadlines_total", "Ticks that ended after the next scheduled tick", ("program", "name"), [(l, p.get("missed_deadlines", 0)) for l, p in zip(labels, profiles)], "counter")
+        lines += gauge_samples("tactigon_shape_last_tick_seconds", "Duration of the last shape tick", ("program", "name"), [(l, p.get("last_tick_duration", 0)) for l, p in zip(labels, profiles)])
+
+        lines += ["# HELP tactigon_shape_tick_seconds Duration of the shape ticks", "# TYPE tactigon_shape_tick_seconds histogram"]
+        for l, p in zip(labels, profiles):
+            if "histogram" in p:
+                lines += histogram_samples("tactigon_shape_tick_seconds", ("program", "name"), l, TickProfiler.BUCKETS, [b["count"] for b in p["histogram"]], p["total"])
+
+        lines += gauge_samples("tactigon_shape_log_queue_depth", "Messages waiting in the shape log queue", ("program", "name"), [(l, s["depth"]) for l, s in zip(labels, stats)])
+        lines += gauge_samples("tactigon_shape_log_dropped_total", "Messages dropped by the full shape log queue", ("program", "name", "severity"), [(l + (severity,), count) for l, s in zip(labels, stats) for severity, count in s["dropped"].items()], "counter")
+        return lines
+
+    def get_run(self, config_id: UUID) -> Optional[str]:
+        return self._runs.get(config_id)
+
+    def query_logs(self, config_id: UUID, run: Optional[str] = None, severities: Optional[List[str]] = None, since: Optional[float] = None, until: Optional[float] = None, page: int = 0, size: int = 100) -> dict:
+        """
+        Query the stored logs of a shape, see logstore.query_logs
+        """
+        if config_id in self._runs:
+            self.log_writer.flush(self.LOG_FLUSH_TIMEOUT)
+
+        return query_logs(self.shapes_file_path, config_id.hex, run, severities, since, until, page, size)
 
     def __create_or_update_files(self, config_id: UUID, program: Program) -> bool:
         folder_path = path.join(self.shapes_file_path, "programs", config_id.hex)
@@ -429,6 +909,8 @@ class ShapesApp(ExtensionApp):
             with open(python_file_path, "w", newline="", encoding="utf-8") as python_file:
                 python_file.write(program.code)
 
+            ProgramCache(python_file_path).build()
+
         with open(state_file_path, "w") as state_json_file:
             json.dump(program.state, state_json_file, indent=2)
 
@@ -0,0 +1,223 @@
+import json
+import os
+from datetime import datetime
+from os import path
+from queue import Empty, SimpleQueue
+from threading import Event, Lock, Thread
+from typing import Any, Callable, Dict, IO, Iterator, List, Optional, Tuple
+
+LOG_DIR = "logs"
+LOG_EXTENSION = ".jsonl"
+
+class LogWriter:
+    """
+    Background writer of the shape logs: one append-only file per run, in the logs folder of the shape,
+    rotated in segments of MAX_BYTES (<run>.jsonl, <run>.1.jsonl, ...).
+    Only MAX_RUNS runs are kept for each shape.
+    The shape threads only put records in a queue, the disk is touched by the writer thread.
+    """
+    MAX_BYTES: int = 1024 * 1024
+    MAX_RUNS: int = 20
+    TICK: float = 0.5
+
+    base_path: str
+    formatter: Optional[Callable[[Any], dict]]
+    _queue: SimpleQueue
+    _files: Dict[Tuple[str, str], Tuple[IO, int, int]]
+    _thread: Optional[Thread]
+    _lock: Lock
+
+    def __init__(self, base_path: str, formatter: Optional[Callable[[Any], dict]] = None):
+        self.base_path = base_path
+        self.formatter = formatter
+        self._queue = SimpleQueue()
+        self._files = {}
+        self._thread = None
+        self._lock = Lock()
+
+    def log_path(self, program_id: str) -> str:
+        return path.join(self.base_path, "programs", program_id, LOG_DIR)
+
+    def write(self, program_id: str, run: str, record: Any):
+        self._queue.put(("write", program_id, run, record))
+
+    def close_run(self, program_id: str, run: str):
+        self._queue.put(("close", program_id, run, None))
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until every record queued so far is on disk
+
+        :param timeout: seconds to wait
+        :return: True if the writer caught up
+        """
+        if not self._thread or not self._thread.is_alive():
+            return True
+
+        done = Event()
+        self._queue.put(("flush", "", "", done))
+        return done.wait(timeout)
+
+    def start(self):
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+
+            self._thread = Thread(target=self.run, name="shapes-log-writer", daemon=True)
+            self._thread.start()
+
+    def begin_run(self, program_id: str) -> str:
+        """
+        Start the writer if needed and name a new run, removing the oldest runs of the shape
+
+        :param program_id: shape id (hex)
+        :return: run name
+        """
+        self.start()
+        self.prune(program_id)
+        return datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+
+    def prune(self, program_id: str):
+        old_runs = list_runs(self.base_path, program_id)[self.MAX_RUNS - 1:]
+        log_path = self.log_path(program_id)
+
+        for run in old_runs:
+            for segment in run_segments(self.base_path, program_id, run):
+                try:
+                    os.remove(path.join(log_path, segment))
+                except OSError:
+                    pass
+
+    def run(self):
+        while True:
+            try:
+                items = [self._queue.get(timeout=self.TICK)]
+            except Empty:
+                continue
+
+            while True:
+                try:
+                    items.append(self._queue.get_nowait())
+                except Empty:
+                    break
+
+            touched = set()
+            for kind, program_id, run, data in items:
+                if kind == "write":
+                    try:
+                        touched.add(self._write(program_id, run, data))
+                    except OSError:
+                        continue
+                elif kind == "close":
+                    self._close(program_id, run)
+                elif kind == "flush":
+                    for key in touched:
+                        if key in self._files:
+                            self._files[key][0].flush()
+                    touched.clear()
+                    data.set()
+
+            for key in touched:
+                if key in self._files:
+                    self._files[key][0].flush()
+
+    def _write(self, program_id: str, run: str, record: Any) -> Tuple[str, str]:
+        key = (program_id, run)
+        line = json.dumps(self.formatter(record) if self.formatter else record, separators=(",", ":")) + "\n"
+
+        if key not in self._files:
+            log_path = self.log_path(program_id)
+            os.makedirs(log_path, exist_ok=True)
+            self._files[key] = (open(path.join(log_path, run + LOG_EXTENSION), "a", encoding="utf-8"), 0, 0)
+
+        log_file, size, segment = self._files[key]
+
+        if size + len(line) > self.MAX_BYTES and size:
+            log_file.close()
+            segment += 1
+            log_file = open(path.join(self.log_path(program_id), f"{run}.{segment}{LOG_EXTENSION}"), "a", encoding="utf-8")
+            size = 0
+
+        log_file.write(line)
+        self._files[key] = (log_file, size + len(line), segment)
+        return key
+
+    def _close(self, program_id: str, run: str):
+        entry = self._files.pop((program_id, run), None)
+        if entry:
+            entry[0].close()
+
+def list_runs(base_path: str, program_id: str) -> List[str]:
+    """
+    List the logged runs of a shape, newest first
+
+    :param base_path: shapes config folder
+    :param program_id: shape id (hex)
+    :return: run names
+    """
+    log_path = path.join(base_path, "programs", program_id, LOG_DIR)
+
+    if not path.exists(log_path):
+        return []
+
+    return sorted({f.split(".")[0] for f in os.listdir(log_path) if f.endswith(LOG_EXTENSION)}, reverse=True)
+
+def run_segments(base_path: str, program_id: str, run: str) -> List[str]:
+    log_path = path.join(base_path, "programs", program_id, LOG_DIR)
+
+    if not path.exists(log_path):
+        return []
+
+    segments = [f for f in os.listdir(log_path) if f.endswith(LOG_EXTENSION) and f.split(".")[0] == run]
+    return sorted(segments, key=lambda f: int(f.split(".")[1]) if f.count(".") > 1 else 0)
+
+def read_run(base_path: str, program_id: str, run: str) -> Iterator[dict]:
+    log_path = path.join(base_path, "programs", program_id, LOG_DIR)
+
+    for segment in run_segments(base_path, program_id, run):
+        with open(path.join(log_path, segment), encoding="utf-8") as log_file:
+            for line in log_file:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+
+def query_logs(base_path: str, program_id: str, run: Optional[str] = None, severities: Optional[List[str]] = None, since: Optional[float] = None, until: Optional[float] = None, page: int = 0, size: int = 100) -> Dict[str, Any]:
+    """
+    Read the stored logs of a shape run
+
+    :param base_path: shapes config folder
+    :param program_id: shape id (hex)
+    :param run: run name, defaults to the latest run
+    :param severities: severity names to keep, all when None
+    :param since: keep the records logged from this unix time
+    :param until: keep the records logged up to this unix time
+    :param page: page number, from 0
+    :param size: records per page
+    :return: the run, the total of matching records and the records of the page
+    """
+    runs = list_runs(base_path, program_id)
+
+    if run is None:
+        run = runs[0] if runs else None
+
+    if run is None or run not in runs:
+        return dict(run=run, runs=runs, total=0, page=page, size=size, logs=[])
+
+    start = page * size
+    total = 0
+    logs = []
+
+    for record in read_run(base_path, program_id, run):
+        if severities and record["severity"] not in severities:
+            continue
+        if since is not None and record["time"] < since:
+            continue
+        if until is not None and record["time"] > until:
+            continue
+
+        if start <= total < start + size:
+            logs.append(record)
+        total += 1
+
+    return dict(run=run, runs=runs, total=total, page=page, size=size, logs=logs)
@@ -0,0 +1,127 @@
+import time
+from threading import Lock
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class TickProfiler:
+    """
+    Collects the duration of the ticks of a shape in a fixed histogram, together with the time
+    spent in each category of external calls (braccio, zion, keyboard, speech)
+    """
+    BUCKETS: Tuple[float, ...] = (0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1, 2, 5)
+    CATEGORIES: Tuple[str, ...] = ("braccio", "zion", "keyboard", "speech")
+
+    budget: float
+    _lock: Lock
+    _counts: List[int]
+    _ticks: int
+    _total: float
+    _max: float
+    _over_budget: int
+    _calls: Dict[str, int]
+    _call_time: Dict[str, float]
+    _tick_start: float
+
+    def __init__(self, budget: float):
+        self.budget = budget
+        self._lock = Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._counts = [0] * (len(self.BUCKETS) + 1)
+            self._ticks = 0
+            self._total = 0
+            self._max = 0
+            self._over_budget = 0
+            self._calls = {c: 0 for c in self.CATEGORIES}
+            self._call_time = {c: 0.0 for c in self.CATEGORIES}
+        self._tick_start = 0
+
+    def start_tick(self):
+        self._tick_start = time.perf_counter()
+
+    def end_tick(self):
+        duration = time.perf_counter() - self._tick_start
+        bucket = next((i for i, upper in enumerate(self.BUCKETS) if duration <= upper), len(self.BUCKETS))
+
+        with self._lock:
+            self._counts[bucket] += 1
+            self._ticks += 1
+            self._total += duration
+            self._max = max(self._max, duration)
+            if duration > self.budget:
+                self._over_budget += 1
+
+    def record_call(self, category: str, duration: float):
+        with self._lock:
+            self._calls[category] += 1
+            self._call_time[category] += duration
+
+    def percentile(self, p: float) -> Optional[float]:
+        """
+        Approximate percentile of the tick duration: upper bound of the bucket holding it
+
+        :param p: percentile, between 0 and 1
+        :return: duration in seconds, None if no tick has been recorded
+        """
+        with self._lock:
+            counts = list(self._counts)
+            ticks = self._ticks
+            _max = self._max
+
+        if not ticks:
+            return None
+
+        rank = p * ticks
+        seen = 0
+        for i, count in enumerate(counts):
+            seen += count
+            if seen >= rank:
+                return self.BUCKETS[i] if i < len(self.BUCKETS) else _max
+
+        return _max
+
+    def toJSON(self) -> dict:
+        p50 = self.percentile(0.5)
+        p99 = self.percentile(0.99)
+
+        with self._lock:
+            return dict(
+                budget=self.budget,
+                ticks=self._ticks,
+                over_budget=self._over_budget,
+                total=self._total,
+                mean=self._total / self._ticks if self._ticks else None,
+                max=self._max,
+                p50=p50,
+                p99=p99,
+                histogram=[dict(le=upper, count=count) for upper, count in zip(list(self.BUCKETS) + ["+Inf"], self._counts)],
+                calls={c: dict(count=self._calls[c], time=self._call_time[c]) for c in self.CATEGORIES},
+            )
+
+class ProfiledProxy:
+    """
+    Wraps an object passed to a shape program and times its method calls under a profiler category.
+    With methods set, only those methods are timed.
+    """
+    def __init__(self, target: Any, category: str, profiler: TickProfiler, methods: Optional[Tuple[str, ...]] = None):
+        self._target = target
+        self._category = category
+        self._profiler = profiler
+        self._methods = methods
+
+    def __getattr__(self, name: str):
+        attr = getattr(self._target, name)
+
+        if not callable(attr) or (self._methods is not None and name not in self._methods):
+            return attr
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return attr(*args, **kwargs)
+            finally:
+                self._profiler.record_call(self._category, time.perf_counter() - start)
+
+        return timed
@@ -0,0 +1,570 @@
+import multiprocessing
+import struct
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from multiprocessing import shared_memory
+from multiprocessing.connection import Connection
+from queue import Empty
+from threading import Thread, Lock, Event
+from typing import Any, Dict, Iterator, Optional
+
+from ..braccio.extension import BraccioInterface
+from ..zion.extension import ZionInterface
+from ..tskin.models import TSkin, OneFingerGesture, TwoFingerGesture, SensorFrame, AngleSample, VectorSample, GestureSample, TouchSample
+
+from .extension import ShapeConfig, ShapeThread, LoggingQueue, Severity
+from ...extensions.base import ExtensionThread
+
+class SensorRing:
+    """
+    Single producer ring buffer of SensorFrame in shared memory.
+    The header holds the sequence number of the last frame written, every slot holds its own sequence number
+    so a reader can detect slots overwritten while it was lagging behind.
+    """
+    HEADER = struct.Struct("<Q")
+    SLOT = struct.Struct("<QdB3f3f3f32sffBBff")
+
+    HAS_ANGLE = 1
+    HAS_ACCELERATION = 2
+    HAS_GYRO = 4
+    HAS_GESTURE = 8
+    HAS_TOUCH = 16
+
+    slots: int
+    _shm: shared_memory.SharedMemory
+    _read_seq: int
+
+    def __init__(self, shm: shared_memory.SharedMemory, slots: int):
+        self._shm = shm
+        self.slots = slots
+        self._read_seq = self.last_seq
+
+    @classmethod
+    def create(cls, slots: int):
+        shm = shared_memory.SharedMemory(create=True, size=cls.HEADER.size + cls.SLOT.size * slots)
+        shm.buf[:cls.HEADER.size] = bytes(cls.HEADER.size)
+        return cls(shm, slots)
+
+    @classmethod
+    def attach(cls, name: str, slots: int):
+        return cls(shared_memory.SharedMemory(name=name), slots)
+
+    @property
+    def name(self) -> str:
+        return self._shm.name
+
+    @property
+    def last_seq(self) -> int:
+        return self.HEADER.unpack_from(self._shm.buf, 0)[0]
+
+    def _offset(self, seq: int) -> int:
+        return self.HEADER.size + (seq % self.slots) * self.SLOT.size
+
+    def write(self, frame: SensorFrame):
+        seq = self.last_seq + 1
+        flags = 0
+        angle = frame.angle or AngleSample(0, 0, 0)
+        acceleration = frame.acceleration or VectorSample(0, 0, 0)
+        gyro = frame.gyro or VectorSample(0, 0, 0)
+        gesture = frame.gesture or GestureSample("", 0, 0)
+        one_finger = two_finger = 0
+        x_pos = y_pos = 0.0
+
+        if frame.angle:
+            flags |= self.HAS_ANGLE
+        if frame.acceleration:
+            flags |= self.HAS_ACCELERATION
+        if frame.gyro:
+            flags |= self.HAS_GYRO
+        if frame.gesture:
+            flags |= self.HAS_GESTURE
+        if frame.touch:
+            flags |= self.HAS_TOUCH
+            one_finger = frame.touch.one_finger.value
+            two_finger = frame.touch.two_finger.value
+            x_pos = frame.touch.x_pos
+            y_pos = frame.touch.y_pos
+
+        self.SLOT.pack_into(
+            self._shm.buf,
+            self._offset(seq),
+            seq,
+            frame.timestamp,
+            flags,
+            angle.roll, angle.pitch, angle.yaw,
+            acceleration.x, acceleration.y, acceleration.z,
+            gyro.x, gyro.y, gyro.z,
+            gesture.gesture.encode()[:32],
+            gesture.probability,
+            gesture.confidence,
+            one_finger,
+            two_finger,
+            x_pos,
+            y_pos,
+        )
+        self.HEADER.pack_into(self._shm.buf, 0, seq)
+
+    def read(self, seq: int) -> Optional[SensorFrame]:
+        slot_seq, timestamp, flags, *values = self.SLOT.unpack_from(self._shm.buf, self._offset(seq))
+
+        if slot_seq != seq:
+            return None
+
+        roll, pitch, yaw, ax, ay, az, gx, gy, gz, gesture, probability, confidence, one_finger, two_finger, x_pos, y_pos = values
+
+        return SensorFrame(
+            timestamp,
+            AngleSample(roll, pitch, yaw) if flags & self.HAS_ANGLE else None,
+            VectorSample(ax, ay, az) if flags & self.HAS_ACCELERATION else None,
+            VectorSample(gx, gy, gz) if flags & self.HAS_GYRO else None,
+            GestureSample(gesture.rstrip(b"\0").decode(), probability, confidence) if flags & self.HAS_GESTURE else None,
+            TouchSample(OneFingerGesture(one_finger), TwoFingerGesture(two_finger), x_pos, y_pos) if flags & self.HAS_TOUCH else None,
+        )
+
+    def read_new(self) -> Iterator[SensorFrame]:
+        """
+        Iterate over the frames written since the last call. Frames lost while lagging are skipped.
+        """
+        last_seq = self.last_seq
+        first_seq = max(self._read_seq + 1, last_seq - self.slots + 1)
+
+        for seq in range(first_seq, last_seq + 1):
+            frame = self.read(seq)
+            if frame:
+                yield frame
+
+        self._read_seq = last_seq
+
+    def close(self):
+        self._shm.close()
+
+    def unlink(self):
+        self._shm.unlink()
+
+class RemoteCall:
+    """
+    Child side of the call channel: forwards attribute reads and method calls to the objects of the server process.
+    Requests carry an id and the answers are read by a background thread, so several calls can be pending at once:
+    a slow Braccio move does not hold back the TSkin or Zion calls of the shape.
+    """
+    CALLABLE = "__callable__"
+
+    _conn: Connection
+    _lock: Lock
+    _next_id: int
+    _waiting: Dict[int, Future]
+
+    def __init__(self, conn: Connection):
+        self._conn = conn
+        self._lock = Lock()
+        self._next_id = 0
+        self._waiting = {}
+        Thread(target=self.receive, daemon=True).start()
+
+    def receive(self):
+        while True:
+            try:
+                request_id, ok, value = self._conn.recv()
+            except (EOFError, OSError):
+                break
+
+            with self._lock:
+                future = self._waiting.pop(request_id, None)
+
+            if future is None:
+                continue
+
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(RuntimeError(value))
+
+        with self._lock:
+            waiting, self._waiting = self._waiting, {}
+
+        for future in waiting.values():
+            future.set_exception(RuntimeError("Server process connection closed"))
+
+    def submit(self, kind: str, target: str, name: str, args: tuple = (), kwargs: Optional[dict] = None) -> Future:
+        """
+        Send a request without waiting for its answer
+
+        :return: Future of the answer
+        """
+        future = Future()
+
+        with self._lock:
+            self._next_id += 1
+            self._waiting[self._next_id] = future
+            self._conn.send((self._next_id, kind, target, name, args, kwargs or {}))
+
+        return future
+
+    def request(self, kind: str, target: str, name: str, args: tuple = (), kwargs: Optional[dict] = None) -> Any:
+        return self.submit(kind, target, name, args, kwargs).result()
+
+    def attribute(self, target: str, name: str) -> Any:
+        value = self.request("getattr", target, name)
+
+        if value == self.CALLABLE:
+            def call(*args, **kwargs):
+                return self.request("call", target, name, args, kwargs)
+            return call
+
+        return value
+
+class RemoteProxy:
+    """
+    Stand-in for an object living in the server process (BraccioInterface, ZionInterface).
+    The *_async methods are queued in the server process, which answers when their Future completes.
+    """
+    ASYNC_SUFFIX = "_async"
+
+    def __init__(self, remote: RemoteCall, target: str):
+        self._remote = remote
+        self._target = target
+
+    def __getattr__(self, name: str):
+        if name.endswith(self.ASYNC_SUFFIX):
+            def submit(*args, **kwargs) -> Future:
+                return self._remote.submit("async", self._target, name, args, kwargs)
+            return submit
+
+        return self._remote.attribute(self._target, name)
+
+class RemoteTSkin:
+    """
+    TSkin stand-in for the shape process. Sensors and gestures come from the SensorRing,
+    transcriptions from the control queue, everything else is forwarded to the server process.
+    """
+    _ring: SensorRing
+    _remote: RemoteCall
+    _events: Any
+    _lock: Lock
+    _frame: Optional[SensorFrame]
+    _gesture: Optional[GestureSample]
+    _touch: Optional[TouchSample]
+    _transcription: Any
+    _event_id: int
+
+    def __init__(self, ring: SensorRing, remote: RemoteCall, events):
+        self._ring = ring
+        self._remote = remote
+        self._events = events
+        self._lock = Lock()
+        self._frame = None
+        self._gesture = None
+        self._touch = None
+        self._transcription = None
+        self._event_id = 0
+
+    def __getattr__(self, name: str):
+        return self._remote.attribute("tskin", name)
+
+    def _sync(self):
+        with self._lock:
+            for frame in self._ring.read_new():
+                self._frame = frame
+                if frame.gesture:
+                    self._gesture = frame.gesture
+                    self._event_id += 1
+                if frame.touch:
+                    self._touch = frame.touch
+                    self._event_id += 1
+
+    def _pop(self, name: str):
+        self._sync()
+        with self._lock:
+            value = getattr(self, name)
+            setattr(self, name, None)
+            return value
+
+    @property
+    def angle(self) -> Optional[AngleSample]:
+        self._sync()
+        return self._frame.angle if self._frame else None
+
+    @property
+    def acceleration(self) -> Optional[VectorSample]:
+        self._sync()
+        return self._frame.acceleration if self._frame else None
+
+    @property
+    def gyro(self) -> Optional[VectorSample]:
+        self._sync()
+        return self._frame.gyro if self._frame else None
+
+    @property
+    def gesture(self) -> Optional[GestureSample]:
+        return self._pop("_gesture")
+
+    @property
+    def touch(self) -> Optional[TouchSample]:
+        return self._pop("_touch")
+
+    @property
+    def touch_preserve(self) -> Optional[TouchSample]:
+        self._sync()
+        return self._touch
+
+    @property
+    def transcription(self):
+        return self._pop("_transcription")
+
+    def set_transcription(self, transcription):
+        with self._lock:
+            self._transcription = transcription
+            self._event_id += 1
+        self._events.set()
+
+    @property
+    def event_id(self) -> int:
+        self._sync()
+        return self._event_id
+
+    def notify_event(self):
+        self._events.set()
+
+    def wait_event(self, last_event_id: int, timeout: Optional[float] = None) -> int:
+        if self.event_id == last_event_id:
+            self._events.wait(timeout)
+            self._events.clear()
+
+        return self.event_id
+
+class RemoteLoggingQueue(LoggingQueue):
+    """
+    LoggingQueue of the shape process: messages are sent to the server process
+    """
+    def __init__(self, queue):
+        LoggingQueue.__init__(self)
+        self._queue = queue
+
+    def put(self, severity: Severity, message: str, timestamp: Optional[float] = None):
+        self._queue.put_nowait(("log", severity.value, timestamp if timestamp is not None else time.monotonic(), message))
+
+def run_shape_process(base_path: str, app: ShapeConfig, ring_name: str, slots: int, conn: Connection, logs, control, events, has_braccio: bool, has_zion: bool, event_driven: bool, heartbeat: float):
+    """
+    Entry point of the shape process: runs a ShapeThread against the remote TSkin, Braccio and Zion
+    """
+    from pynput.keyboard import Controller as KeyboardController
+
+    ring = SensorRing.attach(ring_name, slots)
+    remote = RemoteCall(conn)
+    tskin = RemoteTSkin(ring, remote, events)
+    logging_queue = RemoteLoggingQueue(logs)
+
+    try:
+        thread = ShapeThread(
+            base_path,
+            app,
+            KeyboardController(),
+            RemoteProxy(remote, "braccio") if has_braccio else None,  # type: ignore
+            RemoteProxy(remote, "zion") if has_zion else None,  # type: ignore
+            logging_queue,
+            tskin,  # type: ignore
+            event_driven,
+            heartbeat
+        )
+    except Exception as e:
+        logging_queue.error(f"Shape process failed to start. {e}")
+        ring.close()
+        return
+
+    thread.start()
+
+    while thread.is_alive():
+        logs.put_nowait(("profile", thread.profile))
+
+        try:
+            command, *args = control.get(timeout=heartbeat)
+        except Empty:
+            continue
+
+        if command == "stop":
+            break
+        elif command == "reload":
+            thread.reload()
+        elif command == "transcription":
+            tskin.set_transcription(*args)
+
+    thread.stop()
+    ring.close()
+
+class ProcessShapeThread(ExtensionThread):
+    """
+    Runs a shape in a child process. This thread feeds the TSkin into the SensorRing,
+    forwards the shape logs to the LoggingQueue and serves the Braccio, Zion and TSkin calls of the shape.
+    Calls are served concurrently on a pool of CALL_WORKERS threads, the *_async ones answer when their Future completes.
+    """
+    SLOTS: int = 256
+    STOP_TIMEOUT: float = 2
+    CALL_WORKERS: int = 4
+
+    _tskin: TSkin
+    _logging_queue: LoggingQueue
+    _braccio_interface: Optional[BraccioInterface]
+    _zion_interface: Optional[ZionInterface]
+    _profile: Optional[dict]
+
+    def __init__(self, base_path: str, app: ShapeConfig, braccio: Optional[BraccioInterface], zion: Optional[ZionInterface], logging_queue: LoggingQueue, tskin: TSkin, event_driven: Optional[bool] = None, heartbeat: Optional[float] = None):
+        ExtensionThread.__init__(self)
+
+        self._tskin = tskin
+        self._logging_queue = logging_queue
+        self._braccio_interface = braccio
+        self._zion_interface = zion
+
+        context = multiprocessing.get_context("spawn")
+        self.ring = SensorRing.create(self.SLOTS)
+        self._conn, child_conn = context.Pipe()
+        self._logs = context.Queue()
+        self._control = context.Queue()
+        self._events = context.Event()
+
+        self._process = context.Process(
+            target=run_shape_process,
+            args=(
+                base_path,
+                app,
+                self.ring.name,
+                self.SLOTS,
+                child_conn,
+                self._logs,
+                self._control,
+                self._events,
+                braccio is not None,
+                zion is not None,
+                ShapeThread.EVENT_DRIVEN if event_driven is None else event_driven,
+                ShapeThread.HEARTBEAT if heartbeat is None else heartbeat,
+            ),
+            daemon=True
+        )
+        self._server = Thread(target=self.serve, daemon=True)
+        self._server_stop = Event()
+        self._calls = ThreadPoolExecutor(max_workers=self.CALL_WORKERS, thread_name_prefix="shape-calls")
+        self._send_lock = Lock()
+        self._profile = None
+
+    @property
+    def tskin(self) -> TSkin:
+        return self._tskin
+
+    @property
+    def logging_queue(self) -> LoggingQueue:
+        return self._logging_queue
+
+    def start(self):
+        self._process.start()
+        self._server.start()
+        ExtensionThread.start(self)
+
+    def main(self):
+        frame = SensorFrame.FromTSkin(self._tskin, time.time())
+        self.ring.write(frame)
+
+        if frame.gesture or frame.touch:
+            self._events.set()
+
+        transcription = getattr(self._tskin, "transcription", None)
+        if transcription:
+            self._control.put(("transcription", transcription))
+
+        self.drain_logs()
+
+        if not self._process.is_alive():
+            self.drain_logs()
+            self._logging_queue.error("Shape process terminated")
+            self._stop_event.set()
+
+    @property
+    def profile(self) -> Optional[dict]:
+        return self._profile
+
+    def drain_logs(self):
+        while True:
+            try:
+                item = self._logs.get_nowait()
+            except Empty:
+                return
+
+            if item[0] == "profile":
+                _, self._profile = item
+            else:
+                _, severity, timestamp, message = item
+                self._logging_queue.put(Severity(severity), message, timestamp)
+
+    def serve(self):
+        while not self._server_stop.is_set():
+            try:
+                if not self._conn.poll(self.TICK):
+                    continue
+                request_id, kind, *request = self._conn.recv()
+            except (EOFError, OSError):
+                return
+
+            if kind == "async":
+                self.execute_async(request_id, *request)
+            else:
+                self._calls.submit(self.serve_call, request_id, kind, *request)
+
+    def serve_call(self, request_id: int, kind: str, target: str, name: str, args: tuple, kwargs: dict):
+        self.answer(request_id, *self.execute(kind, target, name, args, kwargs))
+
+    def answer(self, request_id: int, ok: bool, value: Any):
+        with self._send_lock:
+            try:
+                self._conn.send((request_id, ok, value))
+            except (EOFError, OSError):
+                pass
+
+    def execute(self, kind: str, target: str, name: str, args: tuple, kwargs: dict):
+        targets = dict(tskin=self._tskin, braccio=self._braccio_interface, zion=self._zion_interface)
+
+        try:
+            attr = getattr(targets[target], name)
+
+            if kind == "getattr":
+                return (True, RemoteCall.CALLABLE if callable(attr) else attr)
+
+            return (True, attr(*args, **kwargs))
+        except Exception as e:
+            return (False, str(e))
+
+    def execute_async(self, request_id: int, target: str, name: str, args: tuple, kwargs: dict):
+        """
+        Queue an *_async call and answer the shape process once its Future completes
+        """
+        ok, future = self.execute("call", target, name, args, kwargs)
+
+        if not ok or not isinstance(future, Future):
+            self.answer(request_id, ok, future)
+            return
+
+        def done(f: Future):
+            if f.cancelled():
+                self.answer(request_id, False, "Cancelled")
+            elif f.exception():
+                self.answer(request_id, False, str(f.exception()))
+            else:
+                self.answer(request_id, True, f.result())
+
+        future.add_done_callback(done)
+
+    def reload(self):
+        self._control.put(("reload",))
+
+    def stop(self):
+        self._control.put(("stop",))
+        self._process.join(self.STOP_TIMEOUT)
+
+        if self._process.is_alive():
+            self._process.terminate()
+
+        ExtensionThread.stop(self)
+
+        self._server_stop.set()
+        self._server.join()
+        self._calls.shutdown(wait=False)
+        self.ring.close()
+        self.ring.unlink()
@@ -524,6 +524,37 @@ function loadBraccioBlocks(wristOptions, gripperOptions) {
         }
     };
 
+    Blockly.Blocks['braccio_follow'] = {
+        init: function () {
+            this.jsonInit({
+                "type": "braccio_follow",
+                "message0": "Follow (x: %1, y: %2, z: %3)",
+                "args0": [
+                    {
+                        "type": "input_value",
+                        "name": "x",
+                        "check": "Number"
+                    },
+                    {
+                        "type": "input_value",
+                        "name": "y",
+                        "check": "Number"
+                    },
+                    {
+                        "type": "input_value",
+                        "name": "z",
+                        "check": "Number"
+                    }
+                ],
+                "previousStatement": null,
+                "nextStatement": null,
+                "colour": "#cb6434",
+                "tooltip": "Stream a target to Braccio, for moves driven by the TSkin: a target still waiting to be sent is replaced by the newer one",
+                "helpUrl": ""
+            });
+        }
+    };
+
     Blockly.Blocks['braccio_wrist'] = {
         init: function () {
             this.jsonInit({
@@ -833,6 +864,7 @@ import time
 import random
 from numbers import Number
 from datetime import datetime
+from concurrent.futures import Future
 from tactigon_shapes.modules.shapes.extension import ShapesPostAction, LoggingQueue
 from tactigon_shapes.modules.braccio.extension import BraccioInterface, CommandStatus, Wrist, Gripper
 from tactigon_shapes.modules.zion.extension import ZionInterface, Scope, AlarmSearchStatus, AlarmSeverity
@@ -921,42 +953,42 @@ def keyboard_press(keyboard: KeyboardController, commands: List[KeyCode]):
         _k = k.char if isinstance(k, KeyCode) and k.char else k
         keyboard.release(_k)
 
+def braccio_result(logging_queue: LoggingQueue, future: Future):
+    try:
+        res = future.result()
+    except Exception as e:
+        debug(logging_queue, f"Braccio command error: {e}")
+        return
+
+    if res:
+        if res[0]:
+            debug(logging_queue, f"Braccio command executed in {round(res[2], 2)}s.")
+        else:
+            debug(logging_queue, f"Braccio command error: {res[1].name}")
+    else:
+        debug(logging_queue, "Braccio not connected")
+
 def braccio_move(braccio: Optional[BraccioInterface], logging_queue: LoggingQueue, x: float, y: float, z: float):
     if braccio:
-        res = braccio.move(x, y, z)
-        if res:
-            if res[0]:
-                debug(logging_queue, f"Braccio command executed in {round(res[2], 2)}s.")
-            else:
-                debug(logging_queue, f"Braccio command error: {res[1].name}")
-        else:
-            debug(logging_queue, "Braccio not connected")
+        braccio.move_async(x, y, z).add_done_callback(lambda f: braccio_result(logging_queue, f))
+    else:
+        debug(logging_queue, "Braccio not configured")
+
+def braccio_follow(braccio: Optional[BraccioInterface], logging_queue: LoggingQueue, x: float, y: float, z: float):
+    if braccio:
+        braccio.move_async(x, y, z, coalesce=True).add_done_callback(lambda f: braccio_result(logging_queue, f))
     else:
         debug(logging_queue, "Braccio not configured")
 
 def braccio_wrist(braccio: Optional[BraccioInterface], logging_queue: LoggingQueue, wrist: Wrist):
     if braccio:
-        res = braccio.wrist(wrist)
-        if res:
-            if res[0]:
-                debug(logging_queue, f"Braccio command executed in {round(res[2], 2)}s.")
-            else:
-                debug(logging_queue, f"Braccio command error: {res[1].name}")
-        else:
-            debug(logging_queue, "Braccio not connected")
+        braccio.wrist_async(wrist).add_done_callback(lambda f: braccio_result(logging_queue, f))
     else:
         debug(logging_queue, "Braccio not configured")
 
 def braccio_gripper(braccio: Optional[BraccioInterface], logging_queue: LoggingQueue, gripper: Gripper):
     if braccio:
-        res = braccio.gripper(gripper)
-        if res:
-            if res[0]:
-                debug(logging_queue, f"Braccio command executed in {round(res[2], 2)}s.")
-            else:
-                debug(logging_queue, f"Braccio command error: {res[1].name}")
-        else:
-            debug(logging_queue, "Braccio not connected")
+        braccio.gripper_async(gripper).add_done_callback(lambda f: braccio_result(logging_queue, f))
     else:
         debug(logging_queue, "Braccio not configured")
 
@@ -1177,6 +1209,14 @@ function defineBraccioGenerators(){
         return code;
     };
 
+    python.pythonGenerator.forBlock['braccio_follow'] = function (block, generator) {
+        const x = generator.valueToCode(block, 'x', python.Order.ATOMIC);
+        const y = generator.valueToCode(block, 'y', python.Order.ATOMIC);
+        const z = generator.valueToCode(block, 'z', python.Order.ATOMIC);
+        const code = `braccio_follow(braccio, logging_queue, ${x}, ${y}, ${z})\n`;
+        return code;
+    };
+
     python.pythonGenerator.forBlock['braccio_wrist'] = function (block, generator) {
         const x = block.getFieldValue('wrist');
         const code = `braccio_wrist(braccio, logging_queue, Wrist['${x}'])\n`;
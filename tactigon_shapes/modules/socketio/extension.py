@@ -1,23 +1,36 @@
 import sys
+import time
 from threading import Thread, Event
-from flask import Flask
-from flask_socketio import SocketIO
+from flask import Flask, request
+from flask_socketio import SocketIO, join_room, leave_room
 
-from typing import Optional
+from typing import Dict, Optional, Set, Union
 
 from ..braccio.extension import BraccioInterface
 from ..shapes.extension import ShapesApp
 
 from ..tskin.models import TSkin
 
+from .models import SensorRoom, read_sensors
+from ...utils.metrics import SOCKET_EMITS
+
 class SocketApp(SocketIO):
     name: str = "socket_app"
     _TICK: float = 0.02
+    PROFILE_INTERVAL: float = 1
+    STATE_KEEPALIVE: float = 5
+    STATE_TOPIC: str = "state"
+    LOGGING_TOPIC: str = "logging:{}"
+    SENSORS_TOPIC: str = "sensors"
+    log_batch: int = 100
     socket_thread: Optional[Thread]
     _stop_event: Event
     _shapes_app: Optional[ShapesApp] = None
     _braccio_interface: Optional[BraccioInterface] = None
     _last_connection_status: Optional[bool]
+    _tskin: Optional[TSkin] = None
+    _sensor_rooms: Dict[str, SensorRoom]
+    _topics: Dict[str, Set[str]]
 
     def __init__(self, app: Optional[Flask] = None, **kwargs):
         SocketIO.__init__(self, app, **kwargs)
@@ -26,6 +39,14 @@ class SocketApp(SocketIO):
         self._stop_event = Event()
         self._tutorial_app = None
         self._last_connection_status = None
+        self._sensor_rooms = {}
+        self._topics = {}
+
+        self.on_event("disconnect", self.on_disconnect)
+        self.on_event("subscribe", self.on_subscribe)
+        self.on_event("unsubscribe", self.on_unsubscribe)
+        self.on_event("sensors_subscribe", self.on_sensors_subscribe)
+        self.on_event("sensors_unsubscribe", self.on_sensors_unsubscribe)
 
         if app:
             self.init_app(app)
@@ -83,6 +104,7 @@ class SocketApp(SocketIO):
         :tskin: Tactigon Skin reference
         """
 
+        self._tskin = tskin
         self._stop_event.clear()
         self.socket_thread = self.start_background_task(self.socket_emit_function, tskin)
 
@@ -92,28 +114,162 @@ class SocketApp(SocketIO):
         """
         self._stop_event.set()
 
+    def emit(self, event: str, *args, **kwargs):
+        SOCKET_EMITS.inc(event)
+        return SocketIO.emit(self, event, *args, **kwargs)
+
+    def has_subscribers(self, topic: str) -> bool:
+        return bool(self._topics.get(topic))
+
+    def on_subscribe(self, data: Union[str, dict]) -> dict:
+        """
+        Join a topic: "state", "logging:<program_id>" or "sensors" (with rate and fields, see on_sensors_subscribe).
+        A client joining "state" gets the full state right away.
+
+        :param data: topic name, or {"topic": name, ...}
+        :return: subscription description
+        """
+        topic = data["topic"] if isinstance(data, dict) else data
+        sid = request.sid  # type: ignore
+
+        if topic == self.SENSORS_TOPIC:
+            return self.on_sensors_subscribe(data if isinstance(data, dict) else None)
+
+        self._topics.setdefault(topic, set()).add(sid)
+        join_room(topic)
+
+        if topic == self.STATE_TOPIC and self._tskin and self.is_running:
+            self.emit("state", self.get_state(self._tskin), to=sid)
+
+        return dict(topic=topic)
+
+    def on_unsubscribe(self, data: Union[str, dict]):
+        topic = data["topic"] if isinstance(data, dict) else data
+        sid = request.sid  # type: ignore
+
+        if topic == self.SENSORS_TOPIC:
+            self.leave_sensor_room(sid)
+            return
+
+        self.leave_topic(topic, sid)
+
+    def leave_topic(self, topic: str, sid: str):
+        members = self._topics.get(topic)
+
+        if not members or sid not in members:
+            return
+
+        members.discard(sid)
+        leave_room(topic, sid)
+
+        if not members:
+            self._topics.pop(topic, None)
+
+    def on_disconnect(self):
+        sid = request.sid  # type: ignore
+        for topic in list(self._topics):
+            self.leave_topic(topic, sid)
+
+        self.leave_sensor_room(sid)
+
+    def on_sensors_subscribe(self, data: Optional[dict] = None) -> dict:
+        """
+        Start streaming sensor frames to the client, replacing its previous subscription.
+        Clients asking for the same rate and fields share a room, each room is downsampled on its own.
+
+        :param data: {"rate": Hz, "fields": ["angle", "acceleration", "gyro"]}
+        :return: room description, with the binary frame format
+        """
+        sid = request.sid  # type: ignore
+        self.leave_sensor_room(sid)
+
+        room = SensorRoom.FromRequest(data)
+        room = self._sensor_rooms.setdefault(room.name, room)
+        room.members.add(sid)
+        join_room(room.name)
+
+        return room.toJSON()
+
+    def on_sensors_unsubscribe(self, data: Optional[dict] = None):
+        self.leave_sensor_room(request.sid)  # type: ignore
+
+    def leave_sensor_room(self, sid: str):
+        for room in list(self._sensor_rooms.values()):
+            if sid not in room.members:
+                continue
+
+            room.members.discard(sid)
+            leave_room(room.name, sid)
+
+            if not room.members:
+                self._sensor_rooms.pop(room.name, None)
+
+    def emit_sensors(self, tskin: TSkin):
+        now = time.monotonic()
+        due = [room for room in list(self._sensor_rooms.values()) if room.due(now)]
+
+        if not due:
+            return
+
+        fields = list({f for room in due for f in room.fields})
+        sample = read_sensors(tskin, fields)
+        timestamp = time.time()
+
+        for room in due:
+            self.emit("sensors", room.pack(timestamp, sample), to=room.name)
+
+    def get_state(self, tskin: TSkin) -> dict:
+        braccio_status = False
+        braccio_connection = False
+
+        if self.braccio_interface:
+            braccio_status = self.braccio_interface.running
+            braccio_connection = self.braccio_interface.connected
+
+        return {
+            "selector": tskin.selector.value if tskin.selector else None,
+            "connected": tskin.connected,
+            "battery": round(tskin.battery, 2) if tskin.battery is not None else None,
+            "braccio_status": braccio_status,
+            "braccio_connection": braccio_connection,
+        }
+
     def socket_emit_function(self, tskin: TSkin):
+        last_profile = 0
+        last_state = {}
+        last_keepalive = 0
         while not self._stop_event.is_set():
-            braccio_status = False
-            braccio_connection = False
-
-            if self.braccio_interface:
-                braccio_status = self.braccio_interface.running
-                braccio_connection = self.braccio_interface.connected
-
-            payload = {
-                "selector": tskin.selector.value if tskin.selector else None,
-                "connected": tskin.connected,
-                "battery": tskin.battery,
-                "braccio_status": braccio_status,
-                "braccio_connection": braccio_connection,
-            }
-
-            self.emit("state", payload)
-
-            if self._shapes_app and self._shapes_app.is_running:
-                msg = self._shapes_app.get_log()
-                if msg:
-                    self.emit("logging", msg.toJSON())
+            if self.has_subscribers(self.STATE_TOPIC):
+                state = self.get_state(tskin)
+
+                if time.monotonic() - last_keepalive >= SocketApp.STATE_KEEPALIVE:
+                    last_keepalive = time.monotonic()
+                    self.emit("state", state, to=self.STATE_TOPIC)
+                else:
+                    changes = {k: v for k, v in state.items() if k not in last_state or last_state[k] != v}
+                    if changes:
+                        self.emit("state", changes, to=self.STATE_TOPIC)
+
+                last_state = state
+
+            if self._sensor_rooms:
+                self.emit_sensors(tskin)
+
+            if self._shapes_app:
+                logging_topics = {program_id: self.LOGGING_TOPIC.format(program_id.hex) for program_id in self._shapes_app.running_ids}
+                logging_topics = {program_id: topic for program_id, topic in logging_topics.items() if self.has_subscribers(topic)}
+
+                for program_id, topic in logging_topics.items():
+                    messages, pending = self._shapes_app.get_logs(program_id, self.log_batch)
+                    if messages:
+                        stats = self._shapes_app.get_log_stats(program_id)
+                        self.emit("logging", dict(program_id=program_id.hex, messages=[msg.toJSON() for msg in messages], pending=pending, dropped=stats["dropped"] if stats else {}), to=topic)
+
+                if logging_topics and time.monotonic() - last_profile >= SocketApp.PROFILE_INTERVAL:
+                    last_profile = time.monotonic()
+                    for program_id, topic in logging_topics.items():
+                        profile = self._shapes_app.get_profile(program_id)
+                        if profile:
+                            self.emit("profile", dict(profile, program_id=program_id.hex), to=topic)
                 
             self.sleep(SocketApp._TICK)  # type: ignore
\ No newline at end of file
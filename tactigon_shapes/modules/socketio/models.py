@@ -0,0 +1,98 @@
+import math
+import struct
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set, Tuple
+
+from ..tskin.models import TSkin
+
+SENSOR_FIELDS: Dict[str, Tuple[str, str, str]] = {
+    "angle": ("roll", "pitch", "yaw"),
+    "acceleration": ("x", "y", "z"),
+    "gyro": ("x", "y", "z"),
+}
+
+SENSOR_RATES: Tuple[int, ...] = (1, 2, 5, 10, 25, 50)
+
+SensorSample = Dict[str, Tuple[float, float, float]]
+
+def read_sensors(tskin: TSkin, fields: List[str]) -> SensorSample:
+    """
+    Read the requested sensors from the TSkin, NaN for the missing ones
+
+    :param tskin: TSkin to read
+    :param fields: sensor names, keys of SENSOR_FIELDS
+    :return: three values for each sensor
+    """
+    sample = {}
+    for name in fields:
+        value = getattr(tskin, name, None)
+        sample[name] = tuple(getattr(value, axis) for axis in SENSOR_FIELDS[name]) if value else (math.nan, math.nan, math.nan)
+
+    return sample  # type: ignore
+
+@dataclass
+class SensorRoom:
+    """
+    Socket room of the clients streaming the same sensors at the same rate.
+
+    Frames are packed little endian: a byte with the field mask (bit i set for the i-th key of SENSOR_FIELDS),
+    the timestamp as a double, then three floats for each field in SENSOR_FIELDS order.
+    """
+    rate: int
+    fields: List[str]
+    members: Set[str] = field(default_factory=set)
+    next_emit: float = 0
+
+    @staticmethod
+    def Name(rate: int, fields: List[str]) -> str:
+        return f"sensors:{rate}:{'+'.join(fields)}"
+
+    @classmethod
+    def FromRequest(cls, data: Optional[dict]) -> "SensorRoom":
+        data = data or {}
+        requested = data["fields"] if "fields" in data and data["fields"] else list(SENSOR_FIELDS)
+        rate = data["rate"] if "rate" in data else 10
+
+        return cls(
+            min(SENSOR_RATES, key=lambda r: abs(r - rate)),
+            [f for f in SENSOR_FIELDS if f in requested] or list(SENSOR_FIELDS),
+        )
+
+    def __post_init__(self):
+        self._struct = struct.Struct("<Bd" + "3f" * len(self.fields))
+        self._mask = sum(1 << i for i, f in enumerate(SENSOR_FIELDS) if f in self.fields)
+
+    @property
+    def name(self) -> str:
+        return self.Name(self.rate, self.fields)
+
+    @property
+    def interval(self) -> float:
+        return 1 / self.rate
+
+    def due(self, now: float) -> bool:
+        """
+        Check if a frame must be sent, and schedule the next one
+
+        :param now: current time.monotonic()
+        :return: True if the room is due
+        """
+        if now < self.next_emit:
+            return False
+
+        self.next_emit += self.interval
+        if self.next_emit <= now:
+            self.next_emit = now + self.interval
+        return True
+
+    def pack(self, timestamp: float, sample: SensorSample) -> bytes:
+        return self._struct.pack(self._mask, timestamp, *(v for f in self.fields for v in sample[f]))
+
+    def toJSON(self) -> dict:
+        return dict(
+            room=self.name,
+            rate=self.rate,
+            fields=self.fields,
+            format=self._struct.format if isinstance(self._struct.format, str) else self._struct.format.decode(),
+            size=self._struct.size,
+        )
@@ -3,7 +3,8 @@ import json
 from os import path
 from datetime import datetime
 from dataclasses import dataclass
-from typing import Optional, List, Tuple, Iterable
+from threading import Condition, Lock
+from typing import Any, Dict, Optional, List, Tuple, Iterable
 
 from tactigon_gear import TSkinConfig, GestureConfig, Gesture, Hand, Angle, Touch, OneFingerGesture, TwoFingerGesture
 
@@ -13,6 +14,50 @@ else:
     from tactigon_gear import TSkin as OldTSkin
     tactigon_speech_version = None
 
+class SensorEventSource:
+    """
+    Mixin for the TSkin wrappers. Every time the underlying TSkin stores a new gesture,
+    touch or transcription the waiting consumers are woken up.
+    """
+    SENSOR_EVENT_FIELDS: Tuple[str, ...] = ("_gesture", "_touch", "_transcription")
+
+    _sensor_event: Condition
+    _sensor_event_id: int
+
+    def _init_sensor_events(self):
+        self._sensor_event = Condition()
+        self._sensor_event_id = 0
+
+    def __setattr__(self, name, value):
+        super().__setattr__(name, value)
+
+        if value is not None and name in self.SENSOR_EVENT_FIELDS:
+            self.notify_event()
+
+    @property
+    def event_id(self) -> int:
+        return self._sensor_event_id
+
+    def notify_event(self):
+        """
+        Signal a new sensor event to every consumer blocked in wait_event
+        """
+        with self._sensor_event:
+            self._sensor_event_id += 1
+            self._sensor_event.notify_all()
+
+    def wait_event(self, last_event_id: int, timeout: Optional[float] = None) -> int:
+        """
+        Block until a sensor event newer than last_event_id arrives
+
+        :param last_event_id: id of the last event seen by the caller
+        :param timeout: maximum time to wait, in seconds
+        :return: id of the latest event
+        """
+        with self._sensor_event:
+            self._sensor_event.wait_for(lambda: self._sensor_event_id != last_event_id, timeout)
+            return self._sensor_event_id
+
 if sys.platform != "darwin":
     HotWords = Tuple[HotWord, Optional[Iterable["HotWords"]]]
 
@@ -72,11 +117,12 @@ if sys.platform != "darwin":
             d["voice_commands_notification"] = self.voice_commands_notification
             return d
 
-    class TSkin(OldTSkin):
+    class TSkin(SensorEventSource, OldTSkin):
         def __init__(self, config: TSkinConfig, voice_config: Optional[VoiceConfig], debug: bool = False):
             if voice_config is None:
                 raise ValueError("Missing the configuration for the voice")
             
+            self._init_sensor_events()
             OldTSkin.__init__(self, config, voice_config, debug=debug)
 
         @property
@@ -113,8 +159,9 @@ else:
         def toJSON(self) -> dict:
             return {}
         
-    class TSkin(OldTSkin):
+    class TSkin(SensorEventSource, OldTSkin):
         def __init__(self, config: TSkinConfig, voice: Optional[VoiceConfig], debug: bool = False):
+            self._init_sensor_events()
             OldTSkin.__init__(self, config, debug)
 
         @property
@@ -124,6 +171,153 @@ else:
             self._update_touch.release()
             return touch
 
+@dataclass
+class AngleSample:
+    roll: float
+    pitch: float
+    yaw: float
+
+@dataclass
+class VectorSample:
+    x: float
+    y: float
+    z: float
+
+@dataclass
+class GestureSample:
+    gesture: str
+    probability: float = 1
+    confidence: float = 1
+
+@dataclass
+class TouchSample:
+    one_finger: OneFingerGesture
+    two_finger: TwoFingerGesture
+    x_pos: float = 0
+    y_pos: float = 0
+
+@dataclass
+class SensorFrame:
+    """
+    Snapshot of what a shape reads from the TSkin in a tick.
+    Samples expose the same attributes as the tactigon_gear objects they replace.
+    """
+    timestamp: float
+    angle: Optional[AngleSample] = None
+    acceleration: Optional[VectorSample] = None
+    gyro: Optional[VectorSample] = None
+    gesture: Optional[GestureSample] = None
+    touch: Optional[TouchSample] = None
+
+    @classmethod
+    def FromTSkin(cls, tskin, timestamp: float):
+        """
+        Read a frame from a TSkin. Gesture and touch are consumed.
+        """
+        angle = getattr(tskin, "angle", None)
+        acceleration = getattr(tskin, "acceleration", None)
+        gyro = getattr(tskin, "gyro", None)
+        gesture = tskin.gesture
+        touch = tskin.touch
+
+        return cls(
+            timestamp,
+            AngleSample(angle.roll, angle.pitch, angle.yaw) if angle else None,
+            VectorSample(acceleration.x, acceleration.y, acceleration.z) if acceleration else None,
+            VectorSample(gyro.x, gyro.y, gyro.z) if gyro else None,
+            GestureSample(gesture.gesture, getattr(gesture, "probability", 1), getattr(gesture, "confidence", 1)) if gesture else None,
+            TouchSample(touch.one_finger, touch.two_finger, getattr(touch, "x_pos", 0), getattr(touch, "y_pos", 0)) if touch else None,
+        )
+
+class TSkinFanout:
+    """
+    Share one TSkin between several consumers. Reading gesture, touch or transcription
+    consumes the value on the TSkin, so each value is read once and delivered to every subscriber.
+    """
+    CONSUMED_FIELDS: Tuple[str, ...] = ("gesture", "touch", "transcription")
+
+    tskin: TSkin
+    _lock: Lock
+    _subscribers: List["TSkinSubscriber"]
+
+    def __init__(self, tskin: TSkin):
+        self.tskin = tskin
+        self._lock = Lock()
+        self._subscribers = []
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._subscribers)
+
+    def subscribe(self) -> "TSkinSubscriber":
+        subscriber = TSkinSubscriber(self)
+
+        with self._lock:
+            self._subscribers.append(subscriber)
+
+        return subscriber
+
+    def unsubscribe(self, subscriber: "TSkinSubscriber"):
+        with self._lock:
+            if subscriber in self._subscribers:
+                self._subscribers.remove(subscriber)
+
+    def pull(self, field: str, subscriber: "TSkinSubscriber", consume: bool) -> Any:
+        """
+        Read a consumable field from the TSkin, deliver it to every subscriber
+        and return the value pending for the given subscriber
+
+        :param field: one of CONSUMED_FIELDS
+        :param subscriber: subscriber reading the field
+        :param consume: remove the value from the subscriber after reading it
+        :return: the pending value, if any
+        """
+        with self._lock:
+            value = getattr(self.tskin, field)
+
+            if value is not None:
+                for s in self._subscribers:
+                    s._pending[field] = value
+
+            if consume:
+                return subscriber._pending.pop(field, None)
+
+            return subscriber._pending.get(field)
+
+class TSkinSubscriber:
+    """
+    View of a shared TSkin for a single consumer. Gesture, touch and transcription
+    are received through the TSkinFanout, everything else is read from the TSkin.
+    """
+    _fanout: TSkinFanout
+    _pending: Dict[str, Any]
+
+    def __init__(self, fanout: TSkinFanout):
+        self._fanout = fanout
+        self._pending = {}
+
+    def __getattr__(self, name: str):
+        return getattr(self._fanout.tskin, name)
+
+    @property
+    def gesture(self) -> Optional[Gesture]:
+        return self._fanout.pull("gesture", self, True)
+
+    @property
+    def touch(self) -> Optional[Touch]:
+        return self._fanout.pull("touch", self, True)
+
+    @property
+    def touch_preserve(self) -> Optional[Touch]:
+        return self._fanout.pull("touch", self, False)
+
+    @property
+    def transcription(self):
+        return self._fanout.pull("transcription", self, True)
+
+    def close(self):
+        self._fanout.unsubscribe(self)
+
 @dataclass
 class ModelGesture:
     gesture: str
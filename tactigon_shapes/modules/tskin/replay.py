@@ -0,0 +1,292 @@
+import gzip
+import json
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from threading import Condition, Lock
+from typing import Any, List, Optional, Tuple
+
+from .models import TSkin, HotWord, OneFingerGesture, TwoFingerGesture, AngleSample, VectorSample, GestureSample, TouchSample
+
+RecordedEvent = Tuple[float, str, Any]
+
+ANGLE = "a"
+ACCELERATION = "c"
+GYRO = "y"
+GESTURE = "g"
+TOUCH = "t"
+TRANSCRIPTION = "s"
+
+@dataclass
+class TranscriptionSample:
+    text: str
+    path: Optional[List[HotWord]]
+    time: float
+    timeout: bool
+
+class TSkinRecorder:
+    """
+    Wraps the TSkin given to a shape and records, with timestamps, the gesture, touch, angle,
+    acceleration, gyro and transcription values the shape reads.
+    The recording is a gzip compressed JSON lines file: a header, then one [time, kind, value] per line.
+    Continuous sensors are only written when their value changes.
+    """
+    VERSION: int = 1
+
+    file_path: str
+    _tskin: TSkin
+
+    def __init__(self, tskin: TSkin, file_path: str):
+        self._tskin = tskin
+        self.file_path = file_path
+        self._file = gzip.open(file_path, "wt", encoding="utf-8")
+        self._lock = Lock()
+        self._start = time.monotonic()
+        self._last = {}
+        self._file.write(json.dumps(dict(version=self.VERSION, created=datetime.now().isoformat())) + "\n")
+
+    def __getattr__(self, name: str):
+        return getattr(self._tskin, name)
+
+    def _write(self, kind: str, value: Any):
+        with self._lock:
+            if self._file.closed:
+                return
+            self._file.write(json.dumps([round(time.monotonic() - self._start, 4), kind, value], separators=(",", ":")) + "\n")
+
+    def _sample(self, kind: str, value: Any):
+        if value != self._last.get(kind):
+            self._last[kind] = value
+            self._write(kind, value)
+
+    @property
+    def angle(self):
+        angle = self._tskin.angle
+        self._sample(ANGLE, [angle.roll, angle.pitch, angle.yaw] if angle else None)
+        return angle
+
+    @property
+    def acceleration(self):
+        acceleration = self._tskin.acceleration
+        self._sample(ACCELERATION, [acceleration.x, acceleration.y, acceleration.z] if acceleration else None)
+        return acceleration
+
+    @property
+    def gyro(self):
+        gyro = self._tskin.gyro
+        self._sample(GYRO, [gyro.x, gyro.y, gyro.z] if gyro else None)
+        return gyro
+
+    @property
+    def gesture(self):
+        gesture = self._tskin.gesture
+        if gesture:
+            self._write(GESTURE, [gesture.gesture, getattr(gesture, "probability", 1), getattr(gesture, "confidence", 1)])
+        return gesture
+
+    @property
+    def touch(self):
+        touch = self._tskin.touch
+        if touch:
+            self._write(TOUCH, [touch.one_finger.value, touch.two_finger.value, getattr(touch, "x_pos", 0), getattr(touch, "y_pos", 0)])
+        return touch
+
+    @property
+    def touch_preserve(self):
+        return self._tskin.touch_preserve
+
+    @property
+    def transcription(self):
+        transcription = self._tskin.transcription
+        if transcription:
+            self._write(TRANSCRIPTION, [
+                transcription.text,
+                [hw.word for hw in transcription.path] if transcription.path is not None else None,
+                transcription.time,
+                transcription.timeout
+            ])
+        return transcription
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+        close = getattr(self._tskin, "close", None)
+        if close:
+            close()
+
+class ReplayTSkin:
+    """
+    TSkin stand-in that plays back a TSkinRecorder file.
+    With a speed the recording is played on the wall clock (1 is real time, 2 twice as fast...).
+    Without it the clock only moves through advance(), so the replay is fully deterministic.
+    """
+    TICK: float = 0.02
+
+    events: List[RecordedEvent]
+    speed: Optional[float]
+    connected: bool = True
+    battery: float = 1
+    selector = None
+    can_listen: bool = False
+    text_so_far: str = ""
+    is_recording: bool = False
+
+    def __init__(self, events: List[RecordedEvent], speed: Optional[float] = 1):
+        self.events = events
+        self.speed = speed
+        self._condition = Condition()
+        self._event_id = 0
+        self._index = 0
+        self._clock = 0.0
+        self._start = time.monotonic()
+        self._angle = None
+        self._acceleration = None
+        self._gyro = None
+        self._gesture = None
+        self._touch = None
+        self._transcription = None
+
+    @classmethod
+    def FromFile(cls, file_path: str, speed: Optional[float] = 1):
+        with gzip.open(file_path, "rt", encoding="utf-8") as recording:
+            _header, *lines = recording.read().splitlines()
+
+        return cls([tuple(json.loads(line)) for line in lines if line], speed)  # type: ignore
+
+    @property
+    def now(self) -> float:
+        if self.speed:
+            return (time.monotonic() - self._start) * self.speed
+
+        return self._clock
+
+    @property
+    def duration(self) -> float:
+        return self.events[-1][0] if self.events else 0
+
+    @property
+    def finished(self) -> bool:
+        return self._index >= len(self.events)
+
+    def advance(self, seconds: float):
+        """
+        Move the replay clock forward. Only used without speed.
+        """
+        self._clock += seconds
+        self._sync()
+
+    def rewind(self):
+        with self._condition:
+            self._index = 0
+            self._clock = 0.0
+            self._start = time.monotonic()
+
+    def _sync(self):
+        with self._condition:
+            now = self.now
+            discrete = False
+
+            while self._index < len(self.events) and self.events[self._index][0] <= now:
+                _, kind, value = self.events[self._index]
+                self._index += 1
+
+                if kind == ANGLE:
+                    self._angle = AngleSample(*value) if value else None
+                elif kind == ACCELERATION:
+                    self._acceleration = VectorSample(*value) if value else None
+                elif kind == GYRO:
+                    self._gyro = VectorSample(*value) if value else None
+                elif kind == GESTURE:
+                    self._gesture = GestureSample(*value)
+                    discrete = True
+                elif kind == TOUCH:
+                    one_finger, two_finger, x_pos, y_pos = value
+                    self._touch = TouchSample(OneFingerGesture(one_finger), TwoFingerGesture(two_finger), x_pos, y_pos)
+                    discrete = True
+                elif kind == TRANSCRIPTION:
+                    text, path, _time, timeout = value
+                    self._transcription = TranscriptionSample(text, [HotWord(w) for w in path] if path is not None else None, _time, timeout)  # type: ignore
+                    discrete = True
+
+            if discrete:
+                self._event_id += 1
+                self._condition.notify_all()
+
+    def _pop(self, name: str):
+        self._sync()
+        with self._condition:
+            value = getattr(self, name)
+            setattr(self, name, None)
+            return value
+
+    @property
+    def angle(self) -> Optional[AngleSample]:
+        self._sync()
+        return self._angle
+
+    @property
+    def acceleration(self) -> Optional[VectorSample]:
+        self._sync()
+        return self._acceleration
+
+    @property
+    def gyro(self) -> Optional[VectorSample]:
+        self._sync()
+        return self._gyro
+
+    @property
+    def gesture(self) -> Optional[GestureSample]:
+        return self._pop("_gesture")
+
+    @property
+    def touch(self) -> Optional[TouchSample]:
+        return self._pop("_touch")
+
+    @property
+    def touch_preserve(self) -> Optional[TouchSample]:
+        self._sync()
+        return self._touch
+
+    @property
+    def transcription(self) -> Optional[TranscriptionSample]:
+        return self._pop("_transcription")
+
+    @property
+    def event_id(self) -> int:
+        self._sync()
+        return self._event_id
+
+    def notify_event(self):
+        with self._condition:
+            self._event_id += 1
+            self._condition.notify_all()
+
+    def wait_event(self, last_event_id: int, timeout: Optional[float] = None) -> int:
+        """
+        Wait for the next recorded gesture, touch or transcription, notify_event or timeout.
+        Once the recording is over (or without speed, when only advance() moves the clock) it waits for notify_event or timeout.
+        """
+        deadline = time.monotonic() + (timeout if timeout is not None else float("inf"))
+
+        with self._condition:
+            while self.event_id == last_event_id:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+
+                if self.speed and not self.finished:
+                    remaining = min(remaining, max(0, (self.events[self._index][0] - self.now) / self.speed))
+
+                self._condition.wait(remaining if remaining != float("inf") else None)
+
+        return self.event_id
+
+    def listen(self, *args, **kwargs) -> bool:
+        return False
+
+    def play(self, *args, **kwargs):
+        pass
+
+    def record(self, *args, **kwargs):
+        pass
@@ -1,22 +1,40 @@
 import os
+import re
 import json
+import time
 import requests
 
+from concurrent.futures import Future, ThreadPoolExecutor
+from threading import Lock
+from urllib.parse import urlparse
 from flask import Flask
-from typing import Optional, List
+from typing import Callable, Dict, Optional, List, Set, Tuple
 
 from .models import AlarmStatus, ZionConfig, Device, Scope, AlarmSearchStatus, AlarmSeverity
+from ...utils.metrics import ZION_REQUEST_SECONDS, ZION_REQUEST_ERRORS, ZION_SENDS_COALESCED
 
 APPLICATION_JSON = 'application/json'
+ENDPOINT_ID = re.compile(r"/[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}")
 
 class ZionInterface:
+    REQUEST_TIMEOUT: float = 5
+    WORKERS: int = 4
+
     config_file_path: str
     config: Optional[ZionConfig]
+    _executor: ThreadPoolExecutor
+    _pending: Dict[tuple, Tuple[Future, list]]
+    _sending: Set[tuple]
+    _pending_lock: Lock
 
     devices: List[Device] = []
     
     def __init__(self, config_file_path: str, app: Optional[Flask] = None):
         self.config_file_path = config_file_path
+        self._executor = ThreadPoolExecutor(max_workers=self.WORKERS, thread_name_prefix="zion")
+        self._pending = {}
+        self._sending = set()
+        self._pending_lock = Lock()
         self.load_config()
 
         if app:
@@ -74,6 +92,30 @@ class ZionInterface:
             "alarmSearchStatus": [(s.name, s.value) for s in AlarmSearchStatus],
         }
 
+    @staticmethod
+    def endpoint(url: str) -> str:
+        """
+        Metrics label of a Zion url: its path, without the query and with the ids replaced
+        """
+        return ENDPOINT_ID.sub("/:id", urlparse(url).path)
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        endpoint = self.endpoint(url)
+        start = time.perf_counter()
+
+        try:
+            res = requests.request(method, url, timeout=self.REQUEST_TIMEOUT, **kwargs)
+        except requests.RequestException as e:
+            ZION_REQUEST_ERRORS.inc(method, endpoint, type(e).__name__)
+            raise
+        finally:
+            ZION_REQUEST_SECONDS.observe(method, endpoint, value=time.perf_counter() - start)
+
+        if res.status_code >= 400:
+            ZION_REQUEST_ERRORS.inc(method, endpoint, str(res.status_code))
+
+        return res
+
     def do_post(self, url: str, payload: object) -> Optional[requests.Response]:
         if not self.config:
             return None
@@ -91,11 +133,15 @@ class ZionInterface:
             "X-Authorization": f"Bearer {self.token}"
         }
 
-        res = requests.post(
-            url,
-            json=payload,
-            headers=headers
-            )
+        try:
+            res = self.request(
+                "POST",
+                url,
+                json=payload,
+                headers=headers
+                )
+        except requests.RequestException:
+            return None
         
         if res.status_code == 401:
             token = self.refresh_token(self.config.url, self.config.username, self.config.password)
@@ -125,10 +171,14 @@ class ZionInterface:
             "X-Authorization": f"Bearer {self.token}"
         }
 
-        res = requests.get(
-            url,
-            headers=headers
-        )
+        try:
+            res = self.request(
+                "GET",
+                url,
+                headers=headers
+            )
+        except requests.RequestException:
+            return None
 
         if res.status_code == 401:
             token = self.refresh_token(self.config.url, self.config.username, self.config.password)
@@ -147,11 +197,15 @@ class ZionInterface:
             "accept": APPLICATION_JSON,
         }
 
-        res = requests.post(
-            f"{url}api/auth/login",
-            headers=headers,
-            json={"username": username, "password": password}
-        )
+        try:
+            res = self.request(
+                "POST",
+                f"{url}api/auth/login",
+                headers=headers,
+                json={"username": username, "password": password}
+            )
+        except requests.RequestException:
+            return None
         
         if res.status_code != 200:
             return None
@@ -289,3 +343,66 @@ class ZionInterface:
             return False
 
         return False
+
+    def submit(self, key: tuple, fn: Callable, *args, payload: Optional[dict] = None, **kwargs) -> Future:
+        """
+        Run a Zion send on the Zion executor, one at a time for each key.
+        A send waiting for the previous one with the same key is merged with the newer sends,
+        so a shape sending every tick cannot pile up requests when Zion is slow:
+        the pending send takes the arguments of the new one and both callers get the same Future.
+
+        :param key: what the send updates (call, device...)
+        :param fn: send to run
+        :param payload: payload of the send, merged into the one of the pending send (newer values win)
+        :return: Future of the send result
+        """
+        with self._pending_lock:
+            pending = self._pending.get(key)
+
+            if pending:
+                future, call = pending
+                call[0] = args
+                call[2] = kwargs
+                if payload is not None:
+                    call[1] = {**(call[1] or {}), **payload}
+                ZION_SENDS_COALESCED.inc(fn.__name__)
+                return future
+
+            future = Future()
+            self._pending[key] = (future, [args, payload, kwargs])
+
+            if key in self._sending:
+                return future
+
+            self._sending.add(key)
+
+        self._executor.submit(self._run_pending, key, fn)
+        return future
+
+    def _run_pending(self, key: tuple, fn: Callable):
+        with self._pending_lock:
+            future, (args, payload, kwargs) = self._pending.pop(key)
+
+        if future.set_running_or_notify_cancel():
+            try:
+                if payload is not None:
+                    kwargs = dict(kwargs, payload=payload)
+                future.set_result(fn(*args, **kwargs))
+            except Exception as e:
+                future.set_exception(e)
+
+        with self._pending_lock:
+            if key not in self._pending:
+                self._sending.discard(key)
+                return
+
+        self._executor.submit(self._run_pending, key, fn)
+
+    def send_device_last_telemetry_async(self, device_id: str, payload: dict) -> Future:
+        return self.submit(("telemetry", device_id), self.send_device_last_telemetry, device_id, payload=payload)
+
+    def send_device_attr_async(self, device_id: str, payload: dict, scope: Scope = Scope.SERVER) -> Future:
+        return self.submit(("attr", device_id, scope), self.send_device_attr, device_id, scope=scope, payload=payload)
+
+    def upsert_device_alarm_async(self, device_id: str, alarm_name: str, alarm_type: str, severity: AlarmSeverity = AlarmSeverity.CRITICAL, status: AlarmStatus = AlarmStatus.CLEARED_UNACK) -> Future:
+        return self.submit(("alarm", device_id, alarm_name, alarm_type), self.upsert_device_alarm, device_id, alarm_name, alarm_type, severity, status)
@@ -89,11 +89,62 @@ const update_braccio_status = (braccio, data) => {
 }
 
 const socket = io();
+const SENSOR_FIELDS = {angle: ["roll", "pitch", "yaw"], acceleration: ["x", "y", "z"], gyro: ["x", "y", "z"]};
 const BATTERY_REFRESH_RATE = 1*2*1000;
 var last_battery_update_ts = 0;
 var last_battery_update_value = 0;
 var last_connection_status = undefined;
 var last_braccio_connection_status = undefined;
+var last_state = {};
+
+const subscribed_topics = new Set(["state"]);
+var sensors_subscription = undefined;
+
+function subscribe_topic(topic) {
+    subscribed_topics.add(topic);
+    if (socket.connected) {
+        socket.emit("subscribe", {topic: topic});
+    }
+}
+
+function unsubscribe_topic(topic) {
+    subscribed_topics.delete(topic);
+    socket.emit("unsubscribe", {topic: topic});
+}
+
+socket.on("connect", () => {
+    subscribed_topics.forEach((topic) => socket.emit("subscribe", {topic: topic}));
+
+    if (sensors_subscription) {
+        subscribe_sensors(...sensors_subscription);
+    }
+});
+
+function subscribe_sensors(rate, fields, callback) {
+    sensors_subscription = [rate, fields, callback];
+    socket.off("sensors");
+    socket.emit("subscribe", {topic: "sensors", rate: rate, fields: fields}, (room) => {
+        socket.on("sensors", (data) => {
+            const view = new DataView(data);
+            const frame = {timestamp: view.getFloat64(1, true)};
+
+            room.fields.forEach((field, i) => {
+                frame[field] = {};
+                SENSOR_FIELDS[field].forEach((axis, j) => {
+                    frame[field][axis] = view.getFloat32(9 + (i * 3 + j) * 4, true);
+                });
+            });
+
+            callback(frame);
+        });
+    });
+}
+
+function unsubscribe_sensors() {
+    sensors_subscription = undefined;
+    socket.off("sensors");
+    socket.emit("unsubscribe", {topic: "sensors"});
+}
 
 $(()=>{
     /*
@@ -128,7 +179,8 @@ $(()=>{
     });
 
     socket.on("state", function(data) {
-        update_tskin_status(tskin, data);
-        update_braccio_status(braccio, data);
+        last_state = Object.assign(last_state, data);
+        update_tskin_status(tskin, last_state);
+        update_braccio_status(braccio, last_state);
     })
 })
\ No newline at end of file
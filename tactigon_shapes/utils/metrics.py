@@ -0,0 +1,165 @@
+import math
+from threading import Lock
+from typing import Dict, Iterable, List, Optional, Tuple
+
+Labels = Tuple[str, ...]
+
+def format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if math.isnan(value):
+        return "NaN"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+def escape_label(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+def format_labels(names: Iterable[str], values: Iterable[str]) -> str:
+    pairs = [f'{name}="{escape_label(value)}"' for name, value in zip(names, values)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class Metric:
+    """
+    Base of the metrics: a name, a help text and the values for each combination of labels.
+    Updates only take a lock and touch a dict, so they are cheap enough for the hot paths.
+    """
+    TYPE: str = "untyped"
+
+    name: str
+    help: str
+    label_names: Labels
+    _lock: Lock
+
+    def __init__(self, name: str, help: str, label_names: Labels = ()):
+        self.name = name
+        self.help = help
+        self.label_names = label_names
+        self._lock = Lock()
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.TYPE}"]
+
+    def samples(self) -> List[str]:
+        return []
+
+    def render(self) -> List[str]:
+        return self.header() + self.samples()
+
+class Counter(Metric):
+    TYPE = "counter"
+
+    _values: Dict[Labels, float]
+
+    def __init__(self, name: str, help: str, label_names: Labels = ()):
+        Metric.__init__(self, name, help, label_names)
+        self._values = {}
+
+    def inc(self, *labels: str, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = list(self._values.items())
+
+        return [f"{self.name}{format_labels(self.label_names, labels)} {format_value(value)}" for labels, value in values]
+
+class Gauge(Counter):
+    TYPE = "gauge"
+
+    def set(self, *labels: str, value: float):
+        with self._lock:
+            self._values[labels] = value
+
+class Histogram(Metric):
+    TYPE = "histogram"
+    BUCKETS: Tuple[float, ...] = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+    buckets: Tuple[float, ...]
+    _values: Dict[Labels, List[float]]
+
+    def __init__(self, name: str, help: str, label_names: Labels = (), buckets: Optional[Tuple[float, ...]] = None):
+        Metric.__init__(self, name, help, label_names)
+        self.buckets = buckets or self.BUCKETS
+        self._values = {}
+
+    def observe(self, *labels: str, value: float):
+        bucket = next((i for i, upper in enumerate(self.buckets) if value <= upper), len(self.buckets))
+
+        with self._lock:
+            counts = self._values.get(labels)
+            if counts is None:
+                # one count for each bucket, the +Inf bucket, then the sum
+                counts = self._values[labels] = [0] * (len(self.buckets) + 2)
+            counts[bucket] += 1
+            counts[-1] += value
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = [(labels, list(counts)) for labels, counts in self._values.items()]
+
+        lines = []
+        for labels, counts in values:
+            lines += histogram_samples(self.name, self.label_names, labels, self.buckets, counts[:-1], counts[-1])
+
+        return lines
+
+def histogram_samples(name: str, label_names: Labels, labels: Labels, buckets: Iterable[float], counts: List[float], total: float) -> List[str]:
+    """
+    Render the samples of a histogram from the count of each bucket (not cumulative, +Inf last)
+    """
+    lines = []
+    cumulative = 0
+    for upper, count in zip(list(buckets) + [math.inf], counts):
+        cumulative += count
+        lines.append(f"{name}_bucket{format_labels(label_names + ('le',), labels + (format_value(upper),))} {format_value(cumulative)}")
+
+    lines.append(f"{name}_sum{format_labels(label_names, labels)} {format_value(total)}")
+    lines.append(f"{name}_count{format_labels(label_names, labels)} {format_value(cumulative)}")
+    return lines
+
+def gauge_samples(name: str, help: str, label_names: Labels, values: List[Tuple[Labels, float]], type: str = "gauge") -> List[str]:
+    """
+    Render a metric whose values are read at scrape time
+    """
+    return [f"# HELP {name} {help}", f"# TYPE {name} {type}"] + [f"{name}{format_labels(label_names, labels)} {format_value(value)}" for labels, value in values]
+
+class Registry:
+    """
+    Metrics updated by the code paths they measure. Values that are already tracked somewhere else
+    (shape profilers, log queues, TSkin state...) are read at scrape time by the /metrics view.
+    """
+    _metrics: List[Metric]
+
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, help: str, label_names: Labels = ()) -> Counter:
+        return self.register(Counter(name, help, label_names))  # type: ignore
+
+    def gauge(self, name: str, help: str, label_names: Labels = ()) -> Gauge:
+        return self.register(Gauge(name, help, label_names))  # type: ignore
+
+    def histogram(self, name: str, help: str, label_names: Labels = (), buckets: Optional[Tuple[float, ...]] = None) -> Histogram:
+        return self.register(Histogram(name, help, label_names, buckets))  # type: ignore
+
+    def render(self, extra: Optional[List[str]] = None) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines += metric.render()
+
+        return "\n".join(lines + (extra or [])) + "\n"
+
+REGISTRY = Registry()
+
+SOCKET_EMITS = REGISTRY.counter("tactigon_socket_emits_total", "Socket events emitted", ("event",))
+BRACCIO_COMMAND_SECONDS = REGISTRY.histogram("tactigon_braccio_command_seconds", "Braccio command round trip time", ("command", "status"))
+BRACCIO_COMMAND_TIMEOUTS = REGISTRY.counter("tactigon_braccio_command_timeouts_total", "Braccio commands without answer", ("command",))
+BRACCIO_COMMANDS_COALESCED = REGISTRY.counter("tactigon_braccio_commands_coalesced_total", "Braccio commands merged into another one before being sent", ("command", "reason"))
+ZION_REQUEST_SECONDS = REGISTRY.histogram("tactigon_zion_request_seconds", "Zion HTTP request latency", ("method", "endpoint"))
+ZION_REQUEST_ERRORS = REGISTRY.counter("tactigon_zion_request_errors_total", "Zion HTTP requests failed or answered with an error status", ("method", "endpoint", "reason"))
+ZION_SENDS_COALESCED = REGISTRY.counter("tactigon_zion_sends_coalesced_total", "Zion sends merged into a pending one", ("call",))